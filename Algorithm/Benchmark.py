@@ -0,0 +1,259 @@
+"""
+gaze tracking, recognition pipeline 의 단계별 속도 측정
+웹캠, Firebase 없이 합성 frame 이나 녹화된 frame 으로 실행
+
+ex) python Benchmark.py --save baseline.json
+    python Benchmark.py --source recorded/ --students 1,2,4,8 --baseline baseline.json
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import time
+import cv2
+import numpy as np
+from gaze_tracking import GazeTracking
+from gaze_tracking.calibration import Calibration
+from gaze_tracking.eye import Eye, EyeBuffers
+from gaze_tracking.pupil import Pupil
+from recognition import StudentState, AnalysisEngine, read_frames
+
+
+class Point(object):
+    def __init__(self, x, y):
+        self.x = int(round(x))
+        self.y = int(round(y))
+
+
+class SyntheticLandmarks(object):
+    """
+    68 landmarks of a synthetic face, with the same part() access as
+    dlib.full_object_detection
+    """
+
+    def __init__(self, points):
+        self._points = [Point(x, y) for x, y in points]
+
+    def part(self, index):
+        return self._points[index]
+
+    def parts(self):
+        return self._points
+
+
+def eyePoints(ex, ey, ew, eh):
+    # 36~41 (42~47) 순서: 바깥쪽 끝, 위 2개, 안쪽 끝, 아래 2개
+    return [(ex - ew / 2, ey), (ex - ew / 6, ey - eh / 2), (ex + ew / 6, ey - eh / 2),
+            (ex + ew / 2, ey), (ex + ew / 6, ey + eh / 2), (ex - ew / 6, ey + eh / 2)]
+
+
+def syntheticFace(width, height, rng):
+    """Returns a BGR frame with a drawn face and its 68 landmarks"""
+    size = height / 2 * rng.uniform(0.9, 1.1)
+    cx = width / 2 + rng.uniform(-0.05, 0.05) * width
+    cy = height / 2 + rng.uniform(-0.05, 0.05) * height
+    look = rng.uniform(-0.25, 0.25)
+
+    points = []
+    # 턱선 0~16
+    for i in range(17):
+        angle = math.pi * i / 16
+        points.append((cx - size / 2 * math.cos(angle), cy + size / 2 * math.sin(angle) * 0.9))
+    # 눈썹 17~26
+    for i in range(10):
+        points.append((cx - size * 0.35 + size * 0.7 * i / 9, cy - size * 0.28))
+    # 코 27~35
+    for i in range(4):
+        points.append((cx, cy - size * 0.2 + size * 0.08 * i))
+    for i in range(5):
+        points.append((cx - size * 0.08 + size * 0.04 * i, cy + size * 0.08))
+
+    ew, eh = size * 0.2, size * 0.08
+    left_eye = eyePoints(cx - size * 0.2, cy - size * 0.15, ew, eh)
+    right_eye = eyePoints(cx + size * 0.2, cy - size * 0.15, ew, eh)
+    points += left_eye + right_eye
+
+    # 입 48~67
+    for i in range(20):
+        angle = 2 * math.pi * i / 20
+        points.append((cx + size * 0.15 * math.cos(angle), cy + size * 0.25 + size * 0.05 * math.sin(angle)))
+
+    frame = np.full((height, width, 3), 90, np.uint8)
+    cv2.ellipse(frame, (int(cx), int(cy)), (int(size / 2), int(size * 0.6)), 0, 0, 360, (150, 170, 190), -1)
+    for eye in (left_eye, right_eye):
+        region = np.array(eye, np.int32)
+        cv2.fillPoly(frame, [region], (235, 235, 235))
+        ex = (eye[0][0] + eye[3][0]) / 2 + look * ew
+        cv2.circle(frame, (int(ex), int(eye[0][1])), int(eh * 0.45), (40, 30, 30), -1)
+
+    return frame, SyntheticLandmarks(points)
+
+
+def loadFrames(source, limit):
+    """Reads recorded frames from an image directory (in natural order) or a video file"""
+    return [frame for _, frame in read_frames(source, 0, limit)]
+
+
+def loadGaze():
+    """Returns a GazeTracking, or None when the dlib models are missing"""
+    try:
+        return GazeTracking()
+    except RuntimeError as error:
+        print("GazeTracking unavailable, skipped: " + str(error))
+        return None
+
+
+def makeSamples(args, gaze):
+    """Returns the (frame, gray, landmarks) used by every stage"""
+    samples = []
+
+    if args.source:
+        for frame in loadFrames(args.source, args.frames):
+            if gaze is None:
+                continue
+            analysis = gaze.analyze_frame(frame)
+            if analysis.face_found:
+                samples.append((frame, analysis.gray, analysis.landmarks[0]))
+        print("recorded frames with a face: " + str(len(samples)))
+    else:
+        rng = np.random.default_rng(args.seed)
+        for _ in range(args.frames):
+            frame, landmarks = syntheticFace(args.width, args.height, rng)
+            samples.append((frame, cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), landmarks))
+
+    return samples
+
+
+def measure(function, items):
+    """Calls the function on every item and returns the latencies in ms"""
+    latencies = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for item in items:
+            start = time.perf_counter()
+            function(item)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(latencies):
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    mean = float(np.mean(latencies))
+    return {'p50': float(p50), 'p90': float(p90), 'p99': float(p99), 'mean': mean,
+            'fps': 1000 / mean if mean > 0 else 0.0, 'n': len(latencies)}
+
+
+def benchmarkStages(samples, gaze):
+    """Returns the latency summary of each stage"""
+    stages = {}
+    calibration = Calibration()
+    buffers = EyeBuffers()
+
+    eye = Eye.__new__(Eye)
+
+    def isolate(sample):
+        eye._isolate(sample[1], sample[2], Eye.LEFT_EYE_POINTS, buffers)
+        return eye.frame
+
+    eye_frames = []
+    for sample in samples:
+        eye_frames.append(isolate(sample).copy())
+
+    stages['Eye._isolate'] = measure(isolate, samples)
+    stages['Calibration.find_best_threshold'] = measure(calibration.find_best_threshold, eye_frames)
+
+    thresholds = [calibration.find_best_threshold(frame) for frame in eye_frames]
+    stages['Pupil.detect_iris'] = measure(lambda i: Pupil(eye_frames[i], thresholds[i]), range(len(eye_frames)))
+
+    points = [np.array([[p.x, p.y] for p in sample[2].parts()]) for sample in samples]
+    state = StudentState()
+    stages['headCheck'] = measure(lambda p: state.headCheck(p[27][0], p[27][1], p[30][0], p[30][1]), points)
+    stages['faceCloserCheck'] = measure(state.faceCloserCheck, points)
+
+    if gaze is not None:
+        stages['GazeTracking.refresh'] = measure(lambda sample: gaze.refresh(sample[0]), samples)
+
+    return dict((name, summarize(latencies)) for name, latencies in stages.items() if latencies)
+
+
+def benchmarkStudents(samples, students, processes):
+    """Returns the frames per second of the analysis engine for each number of students"""
+    throughput = {}
+    frames = [sample[0] for sample in samples]
+
+    for count in students:
+        with AnalysisEngine(processes) as engine:
+            # 모델 로딩은 제외하고 측정
+            for student in range(count):
+                engine.submit('benchmark', str(student), -1, frames[0])
+            for _ in range(count):
+                engine.get_result()
+
+            start = time.perf_counter()
+            for tick, frame in enumerate(frames):
+                for student in range(count):
+                    engine.submit('benchmark', str(student), tick, frame)
+            for _ in range(len(frames) * count):
+                engine.get_result()
+            elapsed = time.perf_counter() - start
+
+        throughput[str(count)] = len(frames) * count / elapsed
+
+    return throughput
+
+
+def report(result, baseline):
+    print('%-34s %9s %9s %9s %9s' % ('stage', 'p50 ms', 'p90 ms', 'p99 ms', 'fps'))
+    for name, stage in sorted(result['stages'].items()):
+        line = '%-34s %9.3f %9.3f %9.3f %9.1f' % (name, stage['p50'], stage['p90'], stage['p99'], stage['fps'])
+        if baseline and name in baseline.get('stages', {}):
+            before = baseline['stages'][name]['p50']
+            line += '   p50 %+.1f%%' % ((stage['p50'] - before) / before * 100 if before else 0)
+        print(line)
+
+    for count, fps in sorted(result['throughput'].items(), key=lambda item: int(item[0])):
+        line = 'students %-25s %9.1f fps' % (count, fps)
+        if baseline and count in baseline.get('throughput', {}):
+            before = baseline['throughput'][count]
+            line += '   %+.1f%%' % ((fps - before) / before * 100 if before else 0)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmark of the gaze and recognition pipeline')
+    parser.add_argument('--source', help='Directory of recorded images or a video file (default: synthetic frames)')
+    parser.add_argument('--frames', type=int, default=200, help='Number of frames')
+    parser.add_argument('--width', type=int, default=640, help='Width of the synthetic frames')
+    parser.add_argument('--height', type=int, default=480, help='Height of the synthetic frames')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic frames')
+    parser.add_argument('--students', default='', help='Simulated students for the throughput, ex) 1,2,4,8')
+    parser.add_argument('--processes', type=int, default=None, help='Worker processes of the engine')
+    parser.add_argument('--save', help='Save the result in this JSON file')
+    parser.add_argument('--baseline', help='Compare with a result saved before')
+    args = parser.parse_args()
+
+    gaze = loadGaze()
+    samples = makeSamples(args, gaze)
+    if not samples:
+        print("No frame to measure")
+        return
+
+    result = {'stages': benchmarkStages(samples, gaze), 'throughput': {}}
+    students = [int(count) for count in args.students.split(',') if count]
+    if students and gaze is not None:
+        result['throughput'] = benchmarkStudents(samples, students, args.processes)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    report(result, baseline)
+
+    if args.save:
+        with open(args.save, 'w') as save_file:
+            json.dump(result, save_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
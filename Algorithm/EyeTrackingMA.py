@@ -4,6 +4,7 @@ DB에 저장된 학생의 ID 이용해 식별
 import firebase_admin
 from firebase_admin import credentials
 from firebase_admin import db
+from recognition import FirebaseSeriesStore, understand_strings
 
 
 def resetUnderstandResult(studentArray):
@@ -29,7 +30,7 @@ def movingAverage(studentArray):
     global ref
 
     # 전체 eyeTracking 측정 횟수 확인
-    totalCheckNum = len(ref.child(studentArray[0]).child('gaze').get())
+    totalCheckNum = store.length(baseRef + '/' + studentArray[0], 'gaze')
     print(totalCheckNum)
 
     totalCheckNum = int(totalCheckNum)
@@ -38,8 +39,7 @@ def movingAverage(studentArray):
         studentEyePerSec = []
 
         for name in studentArray:
-            gaze = ref.child(name).child('gaze').get()
-            eyeTrackingResult = gaze[i]
+            eyeTrackingResult = store.read(baseRef + '/' + name, 'gaze', i, i + 1)
             # print("name = " + name + " gaze = " + eyeTrackingResult)
 
             eachStudentList = [name, eyeTrackingResult]
@@ -58,6 +58,15 @@ def movingAverage(studentArray):
         compareStudentEye(understandGaze, studentEyePerSec)
 
 
+def batchMovingAverage(studentArray):
+    # 학생마다 gaze 를 한 번만 읽어서 (학생 수, 측정 횟수) 행렬로 한꺼번에 계산
+    gazeArray = [store.read(baseRef + '/' + name, 'gaze') for name in studentArray]
+    understandArray = understand_strings(gazeArray)
+
+    # 모든 학생의 understand 를 multi-path update 한 번으로 저장
+    ref.update(dict((name + '/understand', understand) for name, understand in zip(studentArray, understandArray)))
+
+
 def compareStudentEye(understandGaze, studentEyePerSec):
     for name, gazeResult in studentEyePerSec:
         if understandGaze == gazeResult:
@@ -106,9 +115,12 @@ firebase_admin.initialize_app(cred, {
 ref = db.reference().child('class_v2').child('seojin915').child('20220519').child('scienceA')
 baseRef = 'class_v2/seojin915/20220519/scienceA'
 
+store = FirebaseSeriesStore()
+
 studentArray = ref.child('students').get().split(".")
 studentArray.remove('')
 
 # resetUnderstandResult(studentArray)
 
 # movingAverage(studentArray)
+# batchMovingAverage(studentArray)
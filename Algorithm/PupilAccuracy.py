@@ -0,0 +1,134 @@
+"""
+눈동자 위치 찾는 방법 비교 (contours / fast)
+같은 frame, 같은 threshold 로 두 방법의 눈동자 좌표와 center / left / right / blinking 판단을 비교
+
+ex) python PupilAccuracy.py --source recorded/
+    python PupilAccuracy.py --frames 500 --save accuracy.json
+"""
+import argparse
+import json
+import numpy as np
+from gaze_tracking import GazeSample
+from gaze_tracking.calibration import Calibration
+from gaze_tracking.eye import Eye, EyeBuffers
+from recognition import GAZE_NAMES, gaze_code
+from Benchmark import loadGaze, makeSamples, summarize
+
+METHODS = ('contours', 'fast')
+# 판단 결과 이름, 눈동자를 못 찾은 경우 포함
+CLASS_NAMES = GAZE_NAMES + ['none']
+
+
+def calibrate(samples):
+    """Returns a calibration completed on the first samples, so both
+    methods use the same thresholds
+    """
+    calibration = Calibration()
+    buffers = EyeBuffers()
+    for _, gray, landmarks in samples:
+        if calibration.is_complete():
+            break
+        for side in (0, 1):
+            Eye(gray, landmarks, side, calibration, buffers)
+    return calibration
+
+
+def eyesOf(gray, landmarks, calibration, method):
+    return (Eye(gray, landmarks, 0, calibration, pupil_method=method),
+            Eye(gray, landmarks, 1, calibration, pupil_method=method))
+
+
+def classify(eyes):
+    """Returns the gaze class of two eyes with the rules of GazeTracking"""
+    code = gaze_code(GazeSample(*eyes))
+    return len(GAZE_NAMES) if code is None else code
+
+
+def compare(samples, calibration):
+    """Returns the comparison of the fast method with the contours method"""
+    errors = []
+    located = {'both': 0, 'contours_only': 0, 'fast_only': 0, 'none': 0}
+    confusion = np.zeros((len(CLASS_NAMES), len(CLASS_NAMES)), np.int64)
+    latencies = dict((method, []) for method in METHODS)
+
+    for _, gray, landmarks in samples:
+        eyes = {}
+        for method in METHODS:
+            eyes[method] = eyesOf(gray, landmarks, calibration, method)
+            for eye in eyes[method]:
+                latencies[method].append(eye.timings['pupil'] * 1000)
+
+        for reference, fast in zip(eyes['contours'], eyes['fast']):
+            found = (reference.pupil.x is not None, fast.pupil.x is not None)
+            if found == (True, True):
+                located['both'] += 1
+                errors.append(np.hypot(reference.pupil.x - fast.pupil.x, reference.pupil.y - fast.pupil.y))
+            elif found[0]:
+                located['contours_only'] += 1
+            elif found[1]:
+                located['fast_only'] += 1
+            else:
+                located['none'] += 1
+
+        confusion[classify(eyes['contours']), classify(eyes['fast'])] += 1
+
+    result = {
+        'eyes': located,
+        'confusion': {'rows': 'contours', 'columns': 'fast', 'names': CLASS_NAMES, 'counts': confusion.tolist()},
+        'agreement': float(np.trace(confusion)) / max(int(confusion.sum()), 1),
+        'pupil_ms': dict((method, summarize(values)) for method, values in latencies.items() if values),
+    }
+    if errors:
+        p50, p90, p99 = np.percentile(errors, [50, 90, 99])
+        result['error_px'] = {'p50': float(p50), 'p90': float(p90), 'p99': float(p99),
+                              'mean': float(np.mean(errors)), 'max': float(np.max(errors))}
+    return result
+
+
+def report(result):
+    eyes = result['eyes']
+    print('eyes located: both %d, contours only %d, fast only %d, none %d'
+          % (eyes['both'], eyes['contours_only'], eyes['fast_only'], eyes['none']))
+
+    if 'error_px' in result:
+        error = result['error_px']
+        print('pupil distance px: p50 %.2f  p90 %.2f  p99 %.2f  max %.2f'
+              % (error['p50'], error['p90'], error['p99'], error['max']))
+
+    print('classification agreement: %.1f%%' % (result['agreement'] * 100))
+    print('%-10s' % 'contours' + ''.join('%10s' % name for name in CLASS_NAMES) + '   (fast)')
+    for name, row in zip(CLASS_NAMES, result['confusion']['counts']):
+        print('%-10s' % name + ''.join('%10d' % count for count in row))
+
+    for method, stage in sorted(result['pupil_ms'].items()):
+        print('%-10s pupil p50 %.3f ms  p90 %.3f ms  p99 %.3f ms'
+              % (method, stage['p50'], stage['p90'], stage['p99']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Accuracy of the fast pupil localization against the contours one')
+    parser.add_argument('--source', help='Directory of recorded images or a video file (default: synthetic frames)')
+    parser.add_argument('--frames', type=int, default=200, help='Number of frames')
+    parser.add_argument('--width', type=int, default=640, help='Width of the synthetic frames')
+    parser.add_argument('--height', type=int, default=480, help='Height of the synthetic frames')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic frames')
+    parser.add_argument('--save', help='Save the result in this JSON file')
+    args = parser.parse_args()
+
+    # 녹화된 frame 은 얼굴 검출과 landmark 에만 모델 사용
+    gaze = loadGaze() if args.source else None
+    samples = makeSamples(args, gaze)
+    if not samples:
+        print("No frame to compare")
+        return
+
+    result = compare(samples, calibrate(samples))
+    report(result)
+
+    if args.save:
+        with open(args.save, 'w') as save_file:
+            json.dump(result, save_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+녹화된 수업 영상을 실시간보다 빠르게 다시 분석
+영상을 chunk 로 나눠 여러 process 에서 분석하고, live session 처럼 scheduler 가 고르는 frame (1~6초마다) 으로 검사함
+매 frame 얼굴을 검출하므로 결과는 RecognitionAlgorithm.py --redetect-seconds 0 으로 영상을 분석한 것과 같음
+threshold 를 바꿔서 다시 계산하거나 녹화본으로 series 를 채울 때 사용
+
+ex) python Replay.py class.mp4 --save replay.json
+    python Replay.py class.mp4 --th 20 --fc 15 --database replay.db --path class_v2/seojin915/20261018/scienceA/student1
+    python Replay.py recorded/ --fps 10 --check
+"""
+import argparse
+import json
+import sys
+from recognition import OfflineReplay, SQLiteSeriesStore, write_series
+
+
+def parseArgs(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a recorded class video faster than real time')
+    parser.add_argument('video', help='Video file or directory of images')
+    parser.add_argument('--processes', type=int, default=None, help='Number of processes (default: number of cores)')
+    parser.add_argument('--chunk-frames', type=int, default=None, help='Frames per chunk (default: 2 chunks per process)')
+    parser.add_argument('--step', type=int, default=None,
+                        help='Analyze one frame every STEP frames (default: every fast interval of the scheduler, '
+                             'every frame with --no-sampling)')
+    parser.add_argument('--no-sampling', action='store_true',
+                        help='Check every analyzed frame instead of the frames a live session would sample')
+    parser.add_argument('--fps', type=float, default=None, help='Frames per second (default: read from the video, 30 for images)')
+    parser.add_argument('--period', type=float, default=3.0, help='Seconds of a tick')
+    parser.add_argument('--th', type=float, default=25, help='Threshold of the head check (degrees)')
+    parser.add_argument('--fc', type=float, default=20, help='Threshold of the face closer check (pixels)')
+    parser.add_argument('--detection-scale', type=float, default=1.0, help='Scale of the frames for the face detection')
+    parser.add_argument('--pupil-method', default='contours', choices=('contours', 'fast'),
+                        help='Pupil localization: contours (default) or fast')
+    # seek 가 정확하지 않은 codec 이면 chunk 마다 처음부터 decode
+    parser.add_argument('--no-seek', action='store_true', help='Decode the video from the start instead of seeking')
+    parser.add_argument('--check', action='store_true',
+                        help='Replay again with one process and like a live session, fail if the series differ')
+    parser.add_argument('--save', help='Save the series and the speed in this JSON file')
+    parser.add_argument('--database', help='SQLite file where the series are written')
+    parser.add_argument('--path', help='Path of the student in the database (default: the video name)')
+    return parser.parse_args(argv)
+
+
+def makeReplay(args, processes):
+    return OfflineReplay(args.video, processes=processes, chunk_frames=args.chunk_frames, step=args.step, fps=args.fps, period=args.period, TH_threshold=args.th,
+                         FC_threshold=args.fc, detection_scale=args.detection_scale,
+                         pupil_method=args.pupil_method, seek=not args.no_seek, sampling=not args.no_sampling)
+
+
+def report(result):
+    print('frames %d (%d samples) in %.1f s: %.1f fps, %.1fx real time (%d chunks)'
+          % (result['frames'], result['samples'], result['seconds'], result['fps'], result['realtime'],
+             result['chunks']))
+    for name, chars in sorted(result['series'].items()):
+        print('%-12s %s' % (name, chars))
+
+
+def main(argv=None):
+    args = parseArgs(argv)
+
+    result = makeReplay(args, args.processes).run()
+    report(result)
+
+    if args.check:
+        # 한 process 로 분석한 결과, live session 처럼 sample 한 frame 만 분석한 결과와 같아야 함
+        sequential = makeReplay(args, 1).run()
+        live = makeReplay(args, 1).run_live()
+        for name, series in (('sequential', sequential['series']), ('live', live)):
+            different = [key for key in sorted(result['series']) if series[key] != result['series'][key]]
+            print('%s: %s' % (name, 'same series' if not different else 'different ' + ', '.join(different)))
+            if different:
+                sys.exit(1)
+
+    if args.database:
+        store = SQLiteSeriesStore(args.database)
+        write_series(store, args.path or args.video, result['series'])
+        store.close()
+
+    if args.save:
+        with open(args.save, 'w') as save_file:
+            json.dump(result, save_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
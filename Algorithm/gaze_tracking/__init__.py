@@ -1 +1,6 @@
 from .gaze_tracking import GazeTracking
+from .frame_analysis import FrameAnalysis
+from .calibration import Calibration, CalibrationProfiles
+from .face_tracker import FaceTracker
+from .models import get_face_detector, get_predictor, preload_models
+from .gaze_sample import GazeSample
@@ -1,5 +1,9 @@
 from __future__ import division
+import json
+import os
+from urllib.parse import quote
 import cv2
+import numpy as np
 from .pupil import Pupil
 
 
@@ -48,18 +52,22 @@ class Calibration(object):
         """Calculates the optimal threshold to binarize the
         frame for the given eye.
 
+        The eye frame is filtered once, then the iris size of every
+        threshold is read from the cumulative histogram of the filtered
+        frame: the black pixels for a threshold are the pixels <= threshold.
+
         Argument:
             eye_frame (numpy.ndarray): Frame of the eye to be analyzed
         """
         average_iris_size = 0.48
-        trials = {}
+        thresholds = np.arange(5, 100, 5)
 
-        for threshold in range(5, 100, 5):
-            iris_frame = Pupil.image_processing(eye_frame, threshold)
-            trials[threshold] = Calibration.iris_size(iris_frame)
+        frame = Pupil.filter(eye_frame)[5:-5, 5:-5]
+        histogram = np.bincount(frame.ravel(), minlength=256)
+        nb_blacks = np.cumsum(histogram)[thresholds]
+        iris_sizes = nb_blacks / max(frame.size, 1)
 
-        best_threshold, iris_size = min(trials.items(), key=(lambda p: abs(p[1] - average_iris_size)))
-        return best_threshold
+        return int(thresholds[np.argmin(np.abs(iris_sizes - average_iris_size))])
 
     def evaluate(self, eye_frame, side):
         """Improves calibration by taking into consideration the
@@ -75,3 +83,62 @@ class Calibration(object):
             self.thresholds_left.append(threshold)
         elif side == 1:
             self.thresholds_right.append(threshold)
+
+    def to_dict(self):
+        """Returns the thresholds found for each eye, to be saved"""
+        return {'left': list(self.thresholds_left), 'right': list(self.thresholds_right)}
+
+    @classmethod
+    def from_dict(cls, profile):
+        """Returns a calibration with thresholds saved by to_dict"""
+        calibration = cls()
+        calibration.thresholds_left = [int(threshold) for threshold in profile['left']]
+        calibration.thresholds_right = [int(threshold) for threshold in profile['right']]
+        return calibration
+
+
+class CalibrationProfiles(object):
+    """
+    This class saves finished calibrations per user and camera in a
+    directory, so a user coming back with the same camera doesn't need
+    to be calibrated again.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, user, camera):
+        """Returns the file of the profile, one file per user and camera"""
+        return os.path.join(self.directory, quote(str(user) + '@' + str(camera), safe='') + '.json')
+
+    def get(self, user, camera):
+        """Returns the saved calibration, or None if there is no profile
+
+        Arguments:
+            user (str): User id
+            camera (str): Identifies the camera of the user
+        """
+        try:
+            with open(self._path(user, camera)) as profile_file:
+                return Calibration.from_dict(json.load(profile_file))
+        except (IOError, ValueError, KeyError):
+            return None
+
+    def save(self, user, camera, calibration):
+        """Saves a calibration, if it is complete
+
+        Arguments:
+            user (str): User id
+            camera (str): Identifies the camera of the user
+            calibration (Calibration): Calibration to save
+        """
+        if not calibration.is_complete():
+            return
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        path = self._path(user, camera)
+        with open(path + '.tmp', 'w') as profile_file:
+            json.dump(calibration.to_dict(), profile_file)
+        os.replace(path + '.tmp', path)
@@ -1,9 +1,35 @@
 import math
+import time
 import numpy as np
 import cv2
 from .pupil import Pupil
 
 
+class EyeBuffers(object):
+    """
+    This class keeps the buffers used to isolate an eye, so they are
+    reused from frame to frame instead of being allocated every time.
+    An Eye frame built with these buffers is valid until the next one.
+    """
+
+    def __init__(self):
+        self._eye = np.empty(0, np.uint8)
+        self._mask = np.empty(0, np.uint8)
+
+    def get(self, height, width):
+        """Returns the eye and mask buffers with the given size
+
+        Arguments:
+            height (int): Height of the cropped eye
+            width (int): Width of the cropped eye
+        """
+        size = height * width
+        if self._eye.size < size:
+            self._eye = np.empty(size, np.uint8)
+            self._mask = np.empty(size, np.uint8)
+        return self._eye[:size].reshape(height, width), self._mask[:size].reshape(height, width)
+
+
 class Eye(object):
     """
     This class creates a new frame to isolate the eye and
@@ -13,14 +39,15 @@ class Eye(object):
     LEFT_EYE_POINTS = [36, 37, 38, 39, 40, 41]
     RIGHT_EYE_POINTS = [42, 43, 44, 45, 46, 47]
 
-    def __init__(self, original_frame, landmarks, side, calibration):
+    def __init__(self, original_frame, landmarks, side, calibration, buffers=None, pupil_method='contours'):
         self.frame = None
         self.origin = None
         self.center = None
         self.pupil = None
         self.landmark_points = None
+        self.timings = {}
 
-        self._analyze(original_frame, landmarks, side, calibration)
+        self._analyze(original_frame, landmarks, side, calibration, buffers, pupil_method)
 
     @staticmethod
     def _middle_point(p1, p2):
@@ -34,33 +61,42 @@ class Eye(object):
         y = int((p1.y + p2.y) / 2)
         return (x, y)
 
-    def _isolate(self, frame, landmarks, points):
+    def _isolate(self, frame, landmarks, points, buffers=None):
         """Isolate an eye, to have a frame without other part of the face.
+        The frame is cropped on the eye first and the mask is only applied
+        inside the crop, so the cost depends on the size of the eye and
+        not on the resolution of the camera.
 
         Arguments:
             frame (numpy.ndarray): Frame containing the face
             landmarks (dlib.full_object_detection): Facial landmarks for the face region
             points (list): Points of an eye (from the 68 Multi-PIE landmarks)
+            buffers (EyeBuffers): Buffers reused from frame to frame, optional
         """
         region = np.array([(landmarks.part(point).x, landmarks.part(point).y) for point in points])
         region = region.astype(np.int32)
         self.landmark_points = region
 
-        # Applying a mask to get only the eye
-        height, width = frame.shape[:2]
-        black_frame = np.zeros((height, width), np.uint8)
-        mask = np.full((height, width), 255, np.uint8)
-        cv2.fillPoly(mask, [region], (0, 0, 0))
-        eye = cv2.bitwise_not(black_frame, frame.copy(), mask=mask)
-
         # Cropping on the eye
         margin = 5
-        min_x = np.min(region[:, 0]) - margin
-        max_x = np.max(region[:, 0]) + margin
-        min_y = np.min(region[:, 1]) - margin
-        max_y = np.max(region[:, 1]) + margin
-
-        self.frame = eye[min_y:max_y, min_x:max_x]
+        height, width = frame.shape[:2]
+        min_x = max(np.min(region[:, 0]) - margin, 0)
+        max_x = min(np.max(region[:, 0]) + margin, width)
+        min_y = max(np.min(region[:, 1]) - margin, 0)
+        max_y = min(np.max(region[:, 1]) + margin, height)
+        roi_height, roi_width = max(max_y - min_y, 0), max(max_x - min_x, 0)
+
+        if buffers is None:
+            buffers = EyeBuffers()
+        eye, mask = buffers.get(roi_height, roi_width)
+
+        # Applying a mask inside the crop to get only the eye
+        mask.fill(0)
+        cv2.fillPoly(mask, [(region - (min_x, min_y)).astype(np.int32)], 255)
+        cv2.bitwise_not(mask, eye)
+        cv2.bitwise_or(eye, frame[min_y:max_y, min_x:max_x], eye)
+
+        self.frame = eye
         self.origin = (min_x, min_y)
 
         height, width = self.frame.shape[:2]
@@ -92,7 +128,7 @@ class Eye(object):
 
         return ratio
 
-    def _analyze(self, original_frame, landmarks, side, calibration):
+    def _analyze(self, original_frame, landmarks, side, calibration, buffers=None, pupil_method='contours'):
         """Detects and isolates the eye in a new frame, sends data to the calibration
         and initializes Pupil object.
 
@@ -101,6 +137,8 @@ class Eye(object):
             landmarks (dlib.full_object_detection): Facial landmarks for the face region
             side: Indicates whether it's the left eye (0) or the right eye (1)
             calibration (calibration.Calibration): Manages the binarization threshold value
+            buffers (EyeBuffers): Buffers reused from frame to frame, optional
+            pupil_method (str): Method used to locate the pupil, one of Pupil.METHODS
         """
         if side == 0:
             points = self.LEFT_EYE_POINTS
@@ -110,10 +148,17 @@ class Eye(object):
             return
 
         self.blinking = self._blinking_ratio(landmarks, points)
-        self._isolate(original_frame, landmarks, points)
+
+        start = time.perf_counter()
+        self._isolate(original_frame, landmarks, points, buffers)
+        self.timings['isolation'] = time.perf_counter() - start
 
         if not calibration.is_complete():
+            start = time.perf_counter()
             calibration.evaluate(self.frame, side)
+            self.timings['calibration'] = time.perf_counter() - start
 
+        start = time.perf_counter()
         threshold = calibration.threshold(side)
-        self.pupil = Pupil(self.frame, threshold)
+        self.pupil = Pupil(self.frame, threshold, pupil_method)
+        self.timings['pupil'] = time.perf_counter() - start
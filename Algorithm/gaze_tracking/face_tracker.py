@@ -0,0 +1,213 @@
+from __future__ import division
+import time
+import cv2
+import dlib
+import numpy as np
+from .frame_analysis import FrameAnalysis
+
+# 얼굴 모양 비교에 쓰는 작은 patch 의 크기 (pixel)
+PATCH_SIZE = 24
+
+
+class FaceTracker(object):
+    """
+    This class skips the full face detection between periodic re-detections.
+    The face boxes of a frame are seeded from the landmarks of the previous
+    frame and the landmarks predictor runs directly on them. The predictor
+    always places its points inside the box it gets, so the appearance of
+    every tracked box is compared with the face found by the last detection
+    (normalized correlation of small grayscale patches, much cheaper than
+    the detector): when it drops under 'min_similarity' the face has left
+    the box and the full detection runs on the frame. It also runs again
+    'redetect_seconds' after the last one (on every frame with 0), or as
+    soon as the tracking confidence drops under 'min_confidence'.
+
+    Every face gets a track id which stays the same while it is tracked,
+    and across re-detections when the new box overlaps the previous one
+    by at least 'match_overlap'. A face missing from a detection is kept
+    as lost for 'lost_seconds', so it gets its id back if it is detected
+    again near the same place; after that its track is retired.
+    """
+
+    def __init__(self, redetect_seconds=5.0, min_confidence=0.6, upsample=1, detection_scale=1.0,
+                 match_overlap=0.3, min_similarity=0.5, lost_seconds=10.0):
+        self.redetect_seconds = redetect_seconds
+        self.min_confidence = min_confidence
+        self.upsample = upsample
+        self.detection_scale = detection_scale
+        self.match_overlap = match_overlap
+        self.min_similarity = min_similarity
+        self.lost_seconds = lost_seconds
+        self.confidence = 0.0
+
+        self._faces = []
+        self._offsets = []
+        # 마지막 검출 때 얼굴의 patch
+        self._templates = []
+        self._track_ids = []
+        self._next_track_id = 0
+        self._detected_at = None
+        # 마지막으로 분석한 frame 의 시각
+        self._analyzed_at = None
+        # 검출에서 놓친 얼굴 (box, track id, 놓친 시각)
+        self._lost = []
+
+    @staticmethod
+    def _landmarks_box(landmarks):
+        """Returns (left, top, right, bottom) of the landmarks of a face"""
+        xs = [p.x for p in landmarks.parts()]
+        ys = [p.y for p in landmarks.parts()]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    @staticmethod
+    def _offsets_of(face, landmarks):
+        """Returns the position of the detector box relative to the box of
+        the landmarks, so a box can be rebuilt the same way from new landmarks
+        """
+        left, top, right, bottom = FaceTracker._landmarks_box(landmarks)
+        width = max(right - left, 1)
+        height = max(bottom - top, 1)
+        return ((face.left() - left) / width, (face.top() - top) / height,
+                (face.right() - right) / width, (face.bottom() - bottom) / height)
+
+    @staticmethod
+    def _box_from(landmarks, offsets):
+        """Rebuilds a detector-like box from the landmarks of a face"""
+        left, top, right, bottom = FaceTracker._landmarks_box(landmarks)
+        width = max(right - left, 1)
+        height = max(bottom - top, 1)
+        return dlib.rectangle(int(round(left + offsets[0] * width)), int(round(top + offsets[1] * height)),
+                              int(round(right + offsets[2] * width)), int(round(bottom + offsets[3] * height)))
+
+    @staticmethod
+    def _overlap(a, b):
+        """Returns the intersection over union of two boxes"""
+        width = min(a.right(), b.right()) - max(a.left(), b.left())
+        height = min(a.bottom(), b.bottom()) - max(a.top(), b.top())
+        if width <= 0 or height <= 0:
+            return 0.0
+        intersection = width * height
+        union = a.width() * a.height() + b.width() * b.height() - intersection
+        return intersection / union
+
+    @property
+    def lost_track_ids(self):
+        """Track ids of the faces lost less than 'lost_seconds' before the last analyzed frame"""
+        return [track_id for _, track_id, lost_at in self._lost
+                if self._analyzed_at is None or self._analyzed_at - lost_at < self.lost_seconds]
+
+    def _match(self, faces, timestamp):
+        """Returns the track ids of newly detected faces: the id of the
+        previous or lost face overlapping the most, or a new id. The previous
+        faces left without a match become lost.
+        """
+        previous = ([(face, track_id, timestamp) for face, track_id in zip(self._faces, self._track_ids)]
+                    + [lost for lost in self._lost if timestamp - lost[2] < self.lost_seconds])
+        pairs = sorted(((self._overlap(face, previous_face), index, previous_index)
+                        for index, face in enumerate(faces)
+                        for previous_index, (previous_face, _, _) in enumerate(previous)), reverse=True)
+
+        track_ids = [None] * len(faces)
+        used = set()
+        for overlap, index, previous_index in pairs:
+            if overlap < self.match_overlap:
+                break
+            if track_ids[index] is None and previous_index not in used:
+                track_ids[index] = previous[previous_index][1]
+                used.add(previous_index)
+
+        for index in range(len(faces)):
+            if track_ids[index] is None:
+                track_ids[index] = self._next_track_id
+                self._next_track_id += 1
+
+        # 다시 찾지 못한 얼굴은 lost_seconds 동안 같은 id 로 돌아올 수 있음
+        self._lost = [lost for previous_index, lost in enumerate(previous) if previous_index not in used]
+        return track_ids
+
+    @staticmethod
+    def _patch(gray, face):
+        """Returns a PATCH_SIZE x PATCH_SIZE patch of the face box with zero
+        mean and unit norm, or None when the box is empty or uniform
+        """
+        left, top = max(face.left(), 0), max(face.top(), 0)
+        right, bottom = min(face.right(), gray.shape[1]), min(face.bottom(), gray.shape[0])
+        if right - left < 2 or bottom - top < 2:
+            return None
+        patch = cv2.resize(gray[top:bottom, left:right], (PATCH_SIZE, PATCH_SIZE),
+                           interpolation=cv2.INTER_AREA).astype(np.float32)
+        patch -= patch.mean()
+        norm = np.linalg.norm(patch)
+        if norm < 1e-3:
+            return None
+        return patch / norm
+
+    @staticmethod
+    def _similarity(template, patch):
+        """Returns the normalized correlation of two patches (1.0 for the same image)"""
+        if template is None or patch is None:
+            return 0.0
+        return float(np.dot(template.ravel(), patch.ravel()))
+
+    def _detect(self, frame, face_detector, predictor, timestamp):
+        """Runs the full detection and seeds the tracking with its faces"""
+        analysis = FrameAnalysis(frame, face_detector, predictor, self.upsample,
+                                 detection_scale=self.detection_scale)
+
+        self._track_ids = self._match(analysis.faces, timestamp)
+        analysis.track_ids = list(self._track_ids)
+        self._faces = analysis.faces
+        self._offsets = [self._offsets_of(face, landmarks)
+                         for face, landmarks in zip(analysis.faces, analysis.landmarks)]
+        self._templates = [self._patch(analysis.gray, face) for face in analysis.faces]
+        self._detected_at = timestamp
+        self.confidence = 1.0
+
+        return analysis
+
+    def reset(self):
+        """Forces a full detection on the next frame, the faces are kept
+        to match their track ids
+        """
+        self._detected_at = None
+
+    def analyze(self, frame, face_detector, predictor, timestamp=None):
+        """Returns the FrameAnalysis of the frame, with the faces tracked
+        from the previous frame when possible.
+
+        Arguments:
+            frame (numpy.ndarray): The frame to analyze
+            face_detector: dlib frontal face detector
+            predictor (dlib.shape_predictor): 68 points landmarks predictor
+            timestamp (float): Time of the frame, time.time() by default
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        self._analyzed_at = timestamp
+        if (not self._faces or self._detected_at is None
+                or timestamp - self._detected_at >= self.redetect_seconds):
+            return self._detect(frame, face_detector, predictor, timestamp)
+
+        analysis = FrameAnalysis(frame, face_detector, predictor, self.upsample, self._faces)
+
+        # 얼굴이 나갔어도 landmark 는 box 안에 예측되므로 box 가 검출한 얼굴과 닮았는지 확인
+        start = time.perf_counter()
+        verified = all(self._similarity(template, self._patch(analysis.gray, face)) >= self.min_similarity
+                       for face, template in zip(self._faces, self._templates))
+        analysis.timings['verification'] = time.perf_counter() - start
+        if not verified:
+            self.confidence = 0.0
+            return self._detect(frame, face_detector, predictor, timestamp)
+
+        faces = [self._box_from(landmarks, offsets)
+                 for landmarks, offsets in zip(analysis.landmarks, self._offsets)]
+
+        # landmark 로 다시 만든 box 가 예측에 쓴 box 와 많이 다르면 tracking 실패
+        self.confidence = min(self._overlap(a, b) for a, b in zip(self._faces, faces))
+        if self.confidence < self.min_confidence:
+            return self._detect(frame, face_detector, predictor, timestamp)
+
+        self._faces = faces
+        analysis.track_ids = list(self._track_ids)
+
+        return analysis
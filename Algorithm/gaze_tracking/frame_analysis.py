@@ -0,0 +1,92 @@
+from __future__ import division
+import time
+import cv2
+import dlib
+import numpy as np
+
+
+class FrameAnalysis(object):
+    """
+    This class analyzes a frame a single time: grayscale conversion,
+    face detection and facial landmarks prediction.
+    The result is shared by GazeTracking and the recognition checks,
+    so this work is not repeated for the same frame.
+    The time of each step is kept in 'timings' (seconds).
+    'track_ids' gives an id to each face, stable from frame to frame
+    when the faces are tracked by a FaceTracker.
+    """
+
+    def __init__(self, frame, face_detector, predictor, upsample=1, faces=None, detection_scale=1.0):
+        self.frame = frame
+        self.gray = None
+        self.faces = []
+        self.landmarks = []
+        self.track_ids = []
+        self.detected = False
+        self.timings = {}
+        self._points = {}
+
+        self._analyze(face_detector, predictor, upsample, faces, detection_scale)
+        self.track_ids = list(range(len(self.faces)))
+
+    def _detect(self, face_detector, upsample, detection_scale):
+        """Detects the faces on a downscaled copy of the grayscale frame
+        and maps the boxes back to the full resolution
+
+        Arguments:
+            face_detector: dlib frontal face detector
+            upsample (int): Number of times the image is upsampled for the detection
+            detection_scale (float): Scale of the copy used for the detection (0 < scale <= 1)
+        """
+        if detection_scale >= 1:
+            return list(face_detector(self.gray, upsample))
+
+        small = cv2.resize(self.gray, None, fx=detection_scale, fy=detection_scale, interpolation=cv2.INTER_AREA)
+        return [dlib.rectangle(int(face.left() / detection_scale), int(face.top() / detection_scale),
+                               int(face.right() / detection_scale), int(face.bottom() / detection_scale))
+                for face in face_detector(small, upsample)]
+
+    def _analyze(self, face_detector, predictor, upsample, faces, detection_scale):
+        """Converts the frame to grayscale, detects the faces and
+        predicts the landmarks of every face
+
+        Arguments:
+            face_detector: dlib frontal face detector
+            predictor (dlib.shape_predictor): 68 points landmarks predictor
+            upsample (int): Number of times the image is upsampled for the detection
+            faces (list): Face boxes already known (ex: tracked from the previous
+                frame). When given, the face detection is skipped.
+            detection_scale (float): Scale of the frame used for the detection only,
+                the landmarks are always predicted on the full resolution frame
+        """
+        start = time.perf_counter()
+        self.gray = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+        self.timings['gray'] = time.perf_counter() - start
+
+        if faces is None:
+            start = time.perf_counter()
+            self.faces = self._detect(face_detector, upsample, detection_scale)
+            self.detected = True
+            self.timings['detection'] = time.perf_counter() - start
+        else:
+            self.faces = list(faces)
+
+        start = time.perf_counter()
+        self.landmarks = [predictor(self.gray, face) for face in self.faces]
+        self.timings['landmarks'] = time.perf_counter() - start
+
+    @property
+    def face_found(self):
+        """Check that at least one face has been detected"""
+        return len(self.faces) > 0
+
+    def landmark_points(self, index=0):
+        """Returns the landmarks of a face as a (68, 2) numpy array
+
+        Argument:
+            index (int): Index of the face in the detected faces
+        """
+        if index not in self._points:
+            shape = self.landmarks[index]
+            self._points[index] = np.array([[p.x, p.y] for p in shape.parts()])
+        return self._points[index]
@@ -0,0 +1,87 @@
+from __future__ import division
+
+
+class GazeSample(object):
+    """
+    This class holds the result of the gaze tracking of one frame:
+    the pupils, the ratios and the direction, each computed once when
+    the frame is refreshed. It is immutable, so it can be kept or sent to
+    other threads and processes while the tracking goes on.
+
+    The direction fields are None when the pupils are not located,
+    like the is_* methods of GazeTracking.
+    """
+
+    __slots__ = ('pupils_located', 'pupil_left', 'pupil_right', 'horizontal_ratio', 'vertical_ratio',
+                 'blinking_ratio', 'is_right', 'is_left', 'is_center', 'is_blinking', 'direction')
+
+    def __init__(self, eye_left=None, eye_right=None):
+        """
+        Arguments:
+            eye_left (Eye): Left eye of the frame, None without face
+            eye_right (Eye): Right eye of the frame, None without face
+        """
+        located = self._located(eye_left) and self._located(eye_right)
+        values = dict((name, None) for name in self.__slots__)
+        values['pupils_located'] = located
+
+        if located:
+            values['pupil_left'] = (eye_left.origin[0] + eye_left.pupil.x, eye_left.origin[1] + eye_left.pupil.y)
+            values['pupil_right'] = (eye_right.origin[0] + eye_right.pupil.x, eye_right.origin[1] + eye_right.pupil.y)
+
+            pupil_left = eye_left.pupil.x / (eye_left.center[0] * 2 - 10)
+            pupil_right = eye_right.pupil.x / (eye_right.center[0] * 2 - 10)
+            horizontal = (pupil_left + pupil_right) / 2
+            values['horizontal_ratio'] = horizontal
+
+            pupil_left = eye_left.pupil.y / (eye_left.center[1] * 2 - 10)
+            pupil_right = eye_right.pupil.y / (eye_right.center[1] * 2 - 10)
+            values['vertical_ratio'] = (pupil_left + pupil_right) / 2
+
+            values['is_right'] = horizontal <= 0.35
+            values['is_left'] = horizontal >= 0.65
+            values['is_center'] = not values['is_right'] and not values['is_left']
+            if values['is_right']:
+                values['direction'] = 'right'
+            elif values['is_left']:
+                values['direction'] = 'left'
+            else:
+                values['direction'] = 'center'
+
+            if eye_left.blinking is not None and eye_right.blinking is not None:
+                blinking_ratio = (eye_left.blinking + eye_right.blinking) / 2
+                values['blinking_ratio'] = blinking_ratio
+                values['is_blinking'] = blinking_ratio > 3.8
+
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    @staticmethod
+    def _located(eye):
+        try:
+            int(eye.pupil.x)
+            int(eye.pupil.y)
+            return True
+        except Exception:
+            return False
+
+    def __setattr__(self, name, value):
+        raise AttributeError('GazeSample is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('GazeSample is immutable')
+
+    def __reduce__(self):
+        # pickle 할 때 값 그대로 다시 만들기
+        return (_restore, (tuple(getattr(self, name) for name in self.__slots__),))
+
+    def __repr__(self):
+        return 'GazeSample(direction=%r, horizontal_ratio=%r, is_blinking=%r)' % (
+            self.direction, self.horizontal_ratio, self.is_blinking)
+
+
+def _restore(values):
+    sample = GazeSample.__new__(GazeSample)
+    for name, value in zip(GazeSample.__slots__, values):
+        object.__setattr__(sample, name, value)
+    return sample
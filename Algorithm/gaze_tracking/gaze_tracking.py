@@ -1,9 +1,10 @@
 from __future__ import division
-import os
 import cv2
-import dlib
-from .eye import Eye
+from .models import get_face_detector, get_predictor
+from .eye import Eye, EyeBuffers
 from .calibration import Calibration
+from .frame_analysis import FrameAnalysis
+from .gaze_sample import GazeSample
 
 
 class GazeTracking(object):
@@ -13,118 +14,135 @@ class GazeTracking(object):
     and pupils and allows to know if the eyes are open or closed
     """
 
-    def __init__(self):
+    def __init__(self, detection_scale=1.0, face_detector=None, predictor=None, pupil_method='contours'):
         self.frame = None
         self.eye_left = None
         self.eye_right = None
         self.calibration = Calibration()
+        # sample is the result of the last refresh, computed once per frame
+        self.sample = GazeSample()
+        self._eye_buffers = (EyeBuffers(), EyeBuffers())
+
+        # detection_scale is the scale of the frame used for the face detection only.
+        # Lower is cheaper on high resolution webcams but can miss small faces.
+        self.detection_scale = detection_scale
+
+        # pupil_method is how the pupils are located: 'contours' (default)
+        # or 'fast', cheaper with a gaussian blur and connected components
+        self.pupil_method = pupil_method
 
         # _face_detector is used to detect faces
-        self._face_detector = dlib.get_frontal_face_detector()
+        # The models are loaded once per process unless they are given
+        if face_detector is None:
+            face_detector = get_face_detector()
+        self._face_detector = face_detector
 
         # _predictor is used to get facial landmarks of a given face
-        cwd = os.path.abspath(os.path.dirname(__file__))
-        model_path = os.path.abspath(os.path.join(cwd, "trained_models/shape_predictor_68_face_landmarks.dat"))
-        self._predictor = dlib.shape_predictor(model_path)
+        if predictor is None:
+            predictor = get_predictor()
+        self._predictor = predictor
 
     @property
     def pupils_located(self):
         """Check that the pupils have been located"""
-        try:
-            int(self.eye_left.pupil.x)
-            int(self.eye_left.pupil.y)
-            int(self.eye_right.pupil.x)
-            int(self.eye_right.pupil.y)
-            return True
-        except Exception:
-            return False
-
-    def _analyze(self):
-        """Detects the face and initialize Eye objects"""
-        frame = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
-        faces = self._face_detector(frame)
+        return self.sample.pupils_located
 
+    def _analyze(self, analysis, face_index=0):
+        """Initialize Eye objects from a detected face
+
+        Arguments:
+            analysis (FrameAnalysis): Grayscale frame, faces and landmarks of the frame
+            face_index (int): Index of the face in the analysis, the first one by default
+        """
         try:
-            landmarks = self._predictor(frame, faces[0])
-            self.eye_left = Eye(frame, landmarks, 0, self.calibration)
-            self.eye_right = Eye(frame, landmarks, 1, self.calibration)
+            landmarks = analysis.landmarks[face_index]
+            self.eye_left = Eye(analysis.gray, landmarks, 0, self.calibration, self._eye_buffers[0],
+                                self.pupil_method)
+            self.eye_right = Eye(analysis.gray, landmarks, 1, self.calibration, self._eye_buffers[1],
+                                 self.pupil_method)
 
         except IndexError:
             self.eye_left = None
             self.eye_right = None
 
-    def refresh(self, frame):
+        self.sample = GazeSample(self.eye_left, self.eye_right)
+
+    def analyze_frame(self, frame, upsample=0, tracker=None):
+        """Runs grayscale conversion, face detection and landmarks
+        prediction once on the frame with the models of this instance.
+
+        Arguments:
+            frame (numpy.ndarray): The frame to analyze
+            upsample (int): Number of times the image is upsampled for the detection
+            tracker (FaceTracker): When given, the faces are tracked from the
+                previous frame of this tracker and its own upsample is used
+        """
+        if tracker is not None:
+            return tracker.analyze(frame, self._face_detector, self._predictor)
+        return FrameAnalysis(frame, self._face_detector, self._predictor, upsample,
+                             detection_scale=self.detection_scale)
+
+    def refresh(self, frame, analysis=None, face_index=0):
         """Refreshes the frame and analyzes it.
 
         Arguments:
             frame (numpy.ndarray): The frame to analyze
+            analysis (FrameAnalysis): Analysis of this frame already computed by
+                the caller. When not given, the frame is analyzed here.
+            face_index (int): Face of the analysis to track, when the frame has
+                several faces (one GazeTracking per face)
         """
         self.frame = frame
-        self._analyze()
+        if analysis is None:
+            analysis = self.analyze_frame(frame)
+        self._analyze(analysis, face_index)
 
     def pupil_left_coords(self):
         """Returns the coordinates of the left pupil"""
-        if self.pupils_located:
-            x = self.eye_left.origin[0] + self.eye_left.pupil.x
-            y = self.eye_left.origin[1] + self.eye_left.pupil.y
-            return (x, y)
+        return self.sample.pupil_left
 
     def pupil_right_coords(self):
         """Returns the coordinates of the right pupil"""
-        if self.pupils_located:
-            x = self.eye_right.origin[0] + self.eye_right.pupil.x
-            y = self.eye_right.origin[1] + self.eye_right.pupil.y
-            return (x, y)
+        return self.sample.pupil_right
 
     def horizontal_ratio(self):
         """Returns a number between 0.0 and 1.0 that indicates the
         horizontal direction of the gaze. The extreme right is 0.0,
         the center is 0.5 and the extreme left is 1.0
         """
-        if self.pupils_located:
-            pupil_left = self.eye_left.pupil.x / (self.eye_left.center[0] * 2 - 10)
-            pupil_right = self.eye_right.pupil.x / (self.eye_right.center[0] * 2 - 10)
-            return (pupil_left + pupil_right) / 2
+        return self.sample.horizontal_ratio
 
     def vertical_ratio(self):
         """Returns a number between 0.0 and 1.0 that indicates the
         vertical direction of the gaze. The extreme top is 0.0,
         the center is 0.5 and the extreme bottom is 1.0
         """
-        if self.pupils_located:
-            pupil_left = self.eye_left.pupil.y / (self.eye_left.center[1] * 2 - 10)
-            pupil_right = self.eye_right.pupil.y / (self.eye_right.center[1] * 2 - 10)
-            return (pupil_left + pupil_right) / 2
+        return self.sample.vertical_ratio
 
     def is_right(self):
         """Returns true if the user is looking to the right"""
-        if self.pupils_located:
-            return self.horizontal_ratio() <= 0.35
+        return self.sample.is_right
 
     def is_left(self):
         """Returns true if the user is looking to the left"""
-        if self.pupils_located:
-            return self.horizontal_ratio() >= 0.65
+        return self.sample.is_left
 
     def is_center(self):
         """Returns true if the user is looking to the center"""
-        if self.pupils_located:
-            return self.is_right() is not True and self.is_left() is not True
+        return self.sample.is_center
 
     def is_blinking(self):
         """Returns true if the user closes his eyes"""
-        if self.pupils_located:
-            blinking_ratio = (self.eye_left.blinking + self.eye_right.blinking) / 2
-            return blinking_ratio > 3.8
+        return self.sample.is_blinking
 
     def annotated_frame(self):
         """Returns the main frame with pupils highlighted"""
         frame = self.frame.copy()
 
-        if self.pupils_located:
+        if self.sample.pupils_located:
             color = (0, 255, 0)
-            x_left, y_left = self.pupil_left_coords()
-            x_right, y_right = self.pupil_right_coords()
+            x_left, y_left = self.sample.pupil_left
+            x_right, y_right = self.sample.pupil_right
             cv2.line(frame, (x_left - 5, y_left), (x_left + 5, y_left), color)
             cv2.line(frame, (x_left, y_left - 5), (x_left, y_left + 5), color)
             cv2.line(frame, (x_right - 5, y_right), (x_right + 5, y_right), color)
@@ -0,0 +1,40 @@
+import os
+import dlib
+
+DEFAULT_PREDICTOR_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                      "trained_models/shape_predictor_68_face_landmarks.dat"))
+
+# 한 process 에서 모델은 한 번만 load 해서 모든 GazeTracking 이 같이 사용
+_face_detector = None
+_predictors = {}
+
+
+def get_face_detector():
+    """Returns the dlib frontal face detector of this process"""
+    global _face_detector
+    if _face_detector is None:
+        _face_detector = dlib.get_frontal_face_detector()
+    return _face_detector
+
+
+def get_predictor(path=None):
+    """Returns the 68 landmarks predictor of this process, loaded once per model file
+
+    Argument:
+        path (str): Model file, the one of trained_models by default
+    """
+    path = os.path.abspath(path or DEFAULT_PREDICTOR_PATH)
+    if path not in _predictors:
+        _predictors[path] = dlib.shape_predictor(path)
+    return _predictors[path]
+
+
+def preload_models(path=None):
+    """Loads the models now. Called before forking worker processes, so the
+    workers share the loaded models with the parent (copy-on-write) instead
+    of loading their own copy.
+
+    Argument:
+        path (str): Model file of the landmarks predictor
+    """
+    return get_face_detector(), get_predictor(path)
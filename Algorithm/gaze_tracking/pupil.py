@@ -6,15 +6,48 @@ class Pupil(object):
     """
     This class detects the iris of an eye and estimates
     the position of the pupil
+
+    Two methods are available:
+        'contours': bilateral filter, contours of the binarized eye (default)
+        'fast': gaussian blur, connected components of the binarized eye
     """
 
-    def __init__(self, eye_frame, threshold):
+    METHODS = ('contours', 'fast')
+
+    def __init__(self, eye_frame, threshold, method='contours'):
         self.iris_frame = None
         self.threshold = threshold
         self.x = None
         self.y = None
 
-        self.detect_iris(eye_frame)
+        if method == 'fast':
+            self.detect_iris_fast(eye_frame)
+        elif method == 'contours':
+            self.detect_iris(eye_frame)
+        else:
+            raise ValueError('unknown pupil method: ' + str(method))
+
+    @staticmethod
+    def filter(eye_frame):
+        """Removes the noise of the eye frame before the binarization
+
+        Argument:
+            eye_frame (numpy.ndarray): Frame containing an eye and nothing else
+        """
+        kernel = np.ones((3, 3), np.uint8)
+        new_frame = cv2.bilateralFilter(eye_frame, 10, 15, 15)
+        return cv2.erode(new_frame, kernel, iterations=3)
+
+    @staticmethod
+    def fast_filter(eye_frame):
+        """Cheaper version of filter(): a 5x5 gaussian blur instead of the
+        bilateral filter, and one 7x7 erode which is the same as three 3x3 erodes
+
+        Argument:
+            eye_frame (numpy.ndarray): Frame containing an eye and nothing else
+        """
+        new_frame = cv2.GaussianBlur(eye_frame, (5, 5), 0)
+        return cv2.erode(new_frame, np.ones((7, 7), np.uint8))
 
     @staticmethod
     def image_processing(eye_frame, threshold):
@@ -27,9 +60,7 @@ class Pupil(object):
         Returns:
             A frame with a single element representing the iris
         """
-        kernel = np.ones((3, 3), np.uint8)
-        new_frame = cv2.bilateralFilter(eye_frame, 10, 15, 15)
-        new_frame = cv2.erode(new_frame, kernel, iterations=3)
+        new_frame = Pupil.filter(eye_frame)
         new_frame = cv2.threshold(new_frame, threshold, 255, cv2.THRESH_BINARY)[1]
 
         return new_frame
@@ -52,3 +83,23 @@ class Pupil(object):
             self.y = int(moments['m01'] / moments['m00'])
         except (IndexError, ZeroDivisionError):
             pass
+
+    def detect_iris_fast(self, eye_frame):
+        """Detects the iris as the biggest dark connected component of the
+        binarized eye, and uses its centroid as the position of the pupil.
+
+        Arguments:
+            eye_frame (numpy.ndarray): Frame containing an eye and nothing else
+        """
+        new_frame = self.fast_filter(eye_frame)
+        # 어두운 부분 (홍채) 이 255 가 되도록 반전해서 binarize
+        self.iris_frame = cv2.threshold(new_frame, self.threshold, 255, cv2.THRESH_BINARY_INV)[1]
+
+        count, _, stats, centroids = cv2.connectedComponentsWithStats(self.iris_frame, connectivity=8)
+        if count < 2:
+            return
+
+        # label 0 은 배경
+        largest = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+        self.x = int(centroids[largest][0])
+        self.y = int(centroids[largest][1])
@@ -0,0 +1,15 @@
+from .student_state import StudentState
+from .engine import AnalysisEngine
+from .room_aggregator import GAZE_NAMES, RoomAggregator, gaze_mode
+from .series_store import SeriesStore, FirebaseSeriesStore, SQLiteSeriesStore
+from .understanding import gaze_matrix, gaze_modes, understand_strings
+from .metrics import Metrics
+from .write_behind import WriteBehindStore
+from .frame_source import FrameSource, DeviceSource, VideoFileSource, ImageDirectorySource, StreamSource, SocketSource, BufferedSource, encode_frame, open_source, image_names, natural_key
+from .frame_ring import FrameRing
+from .session import RecognitionSession, initialize_firebase, class_paths
+from .scheduler import SamplingScheduler, CpuBudget
+from .gaze_window import GazeWindow, GazeRecord, gaze_code
+from .series_codec import SERIES_BITS
+from .rollup import Rollups, rollup_rates, read_rollups, index_path
+from .replay import OfflineReplay, FrameRecord, read_frames, stitch, write_series
@@ -0,0 +1,216 @@
+import multiprocessing
+import os
+import traceback
+import zlib
+from gaze_tracking import GazeTracking, CalibrationProfiles, get_face_detector, get_predictor, preload_models
+from .metrics import Metrics
+from .student_state import StudentState
+
+
+def _write_metrics(metrics, metrics_path, index):
+    """Writes the metrics of a worker, one file per worker"""
+    path = os.path.join(metrics_path, 'worker-%d' % index)
+    metrics.write_prometheus(path + '.prom')
+    metrics.write_json(path + '.json')
+
+
+def _worker(index, tasks, results, TH_threshold, FC_threshold, calibration_profiles, detection_scale,
+            metrics_path, metrics_interval, frame_ring, predictor_path, pupil_method):
+    """Worker process loop. The models are loaded once when the worker
+    starts and the state of every student routed to this worker is kept
+    here between the ticks.
+
+    Arguments:
+        index (int): Index of the worker
+        tasks (multiprocessing.Queue): (room, student, tick, frame) to analyze
+        results (multiprocessing.Queue): (room, student, tick, result) analyzed, result
+            is {'error': traceback} when the analysis failed
+        TH_threshold: Threshold of the head check
+        FC_threshold: Threshold of the face closer check
+        calibration_profiles (str): Directory of the saved calibrations, or None
+        detection_scale (float): Scale of the frames used for the face detection
+        metrics_path (str): Directory where the metrics are exported, or None
+        metrics_interval (int): Number of frames between two exports of the metrics
+        frame_ring (FrameRing): Shared memory of the frames sent by slot index, or None
+        predictor_path (str): Model file of the landmarks predictor, or None for the default one
+        pupil_method (str): Method used to locate the pupils, 'contours' or 'fast'
+    """
+    # fork 로 시작했으면 부모가 미리 load 한 모델을 그대로 사용
+    gaze = GazeTracking(face_detector=get_face_detector(), predictor=get_predictor(predictor_path),
+                        pupil_method=pupil_method)
+    states = {}
+    metrics = Metrics()
+    analyzed = 0
+    profiles = None
+    if calibration_profiles is not None:
+        profiles = CalibrationProfiles(calibration_profiles)
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            if metrics_path is not None:
+                _write_metrics(metrics, metrics_path, index)
+            break
+
+        room, student, tick, frame = task
+        key = (room, student)
+
+        if frame is None:
+            # 학생이 나가면 상태 정리
+            states.pop(key, None)
+            continue
+
+        slot = None
+        try:
+            if isinstance(frame, int):
+                # shared memory 의 frame 을 복사 없이 그대로 분석
+                slot = frame
+                frame = frame_ring.view(slot)
+
+            state = states.get(key)
+            if state is None:
+                state = StudentState(TH_threshold, FC_threshold, detection_scale=detection_scale)
+                if profiles is not None:
+                    # 저장된 calibration 이 있으면 calibration 을 건너뜀
+                    state.calibration = profiles.get(student, 'default') or state.calibration
+                states[key] = state
+
+            calibrated = state.calibration.is_complete()
+            analysis = gaze.analyze_frame(frame, 1, state.tracker)
+            gaze.calibration = state.calibration
+            gaze.refresh(frame, analysis)
+
+            if profiles is not None and not calibrated and state.calibration.is_complete():
+                profiles.save(student, 'default', state.calibration)
+
+            result = state.update(analysis, gaze, tick)
+            metrics.observe_tick(room, student, analysis, gaze, state)
+        except Exception:
+            # frame 하나의 분석이 실패해도 worker 는 계속, 결과 대신 error 를 돌려줌
+            traceback.print_exc()
+            metrics.increment('errors', room, student)
+            result = {'error': traceback.format_exc()}
+        finally:
+            if slot is not None:
+                # 분석이 끝났으니 (실패해도) slot 을 다시 쓸 수 있게 돌려줌
+                frame_ring.release(slot)
+
+        results.put((room, student, tick, result))
+
+        analyzed += 1
+        if metrics_path is not None and analyzed % metrics_interval == 0:
+            _write_metrics(metrics, metrics_path, index)
+
+
+class AnalysisEngine(object):
+    """
+    This class analyzes the frames of many students with a pool of
+    worker processes. The frames of one student always go to the same
+    worker, which keeps the moving windows, the calibration and the
+    gaze window of that student.
+    With a FrameRing, the frames are handed to the workers through
+    shared memory instead of being pickled in the queues.
+    """
+
+    def __init__(self, processes=None, TH_threshold=25, FC_threshold=20, calibration_profiles=None,
+                 detection_scale=1.0, metrics_path=None, metrics_interval=100, frame_ring=None,
+                 predictor_path=None, pupil_method='contours'):
+        self.processes = processes or multiprocessing.cpu_count()
+        self.TH_threshold = TH_threshold
+        self.FC_threshold = FC_threshold
+        self.calibration_profiles = calibration_profiles
+        self.detection_scale = detection_scale
+        self.metrics_path = metrics_path
+        self.metrics_interval = metrics_interval
+        self.frame_ring = frame_ring
+        self.predictor_path = predictor_path
+        self.pupil_method = pupil_method
+
+        self._tasks = []
+        self._results = None
+        self._workers = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        """Starts the worker processes. Where fork is available, the models
+        are loaded here once before forking and shared by every worker.
+        """
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+            preload_models(self.predictor_path)
+        else:
+            context = multiprocessing.get_context()
+
+        self._results = context.Queue()
+
+        for index in range(self.processes):
+            tasks = context.Queue()
+            worker = context.Process(target=_worker,
+                                     args=(index, tasks, self._results, self.TH_threshold, self.FC_threshold,
+                                           self.calibration_profiles, self.detection_scale,
+                                           self.metrics_path, self.metrics_interval, self.frame_ring,
+                                           self.predictor_path, self.pupil_method))
+            worker.daemon = True
+            worker.start()
+            self._tasks.append(tasks)
+            self._workers.append(worker)
+
+    def _route(self, room, student):
+        """Returns the task queue of the worker in charge of the student"""
+        key = (room + '/' + student).encode('utf-8')
+        return self._tasks[zlib.crc32(key) % len(self._tasks)]
+
+    def submit(self, room, student, tick, frame):
+        """Sends a frame of a student to be analyzed.
+
+        Arguments:
+            room (str): Room name (teacherID-class name)
+            student (str): Student id
+            tick (int): Index of the tick of the frame
+            frame (numpy.ndarray): The frame to analyze
+        """
+        if self.frame_ring is not None:
+            self.submit_slot(room, student, tick, self.frame_ring.write(frame))
+        else:
+            self._route(room, student).put((room, student, tick, frame))
+
+    def submit_slot(self, room, student, tick, slot):
+        """Sends a frame already written in the frame ring, only its
+        slot index goes through the queue. The worker releases the slot.
+
+        Arguments:
+            room (str): Room name (teacherID-class name)
+            student (str): Student id
+            tick (int): Index of the tick of the frame
+            slot (int): Slot of the frame in the frame ring of the engine
+        """
+        self._route(room, student).put((room, student, tick, slot))
+
+    def release(self, room, student):
+        """Drops the state kept by the worker for the student"""
+        self._route(room, student).put((room, student, None, None))
+
+    def get_result(self, block=True, timeout=None):
+        """Returns the next analyzed (room, student, tick, result).
+        The result is the dict returned by StudentState.update, or
+        {'error': traceback} when the analysis of the frame failed
+        """
+        return self._results.get(block, timeout)
+
+    def close(self):
+        """Stops the worker processes once their tasks are done.
+        The remaining results must be read before, or the workers can't exit.
+        """
+        for tasks in self._tasks:
+            tasks.put(None)
+        for worker in self._workers:
+            worker.join()
+
+        self._tasks = []
+        self._workers = []
@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+import numpy as np
+
+# slot 마다 (height, width, channels)
+HEADER_FIELDS = 3
+ALIGNMENT = 64
+
+
+def _attach(name):
+    """Attaches an existing shared memory block without letting this process
+    unlink it when it exits (track is only available from Python 3.13)
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class FrameRing(object):
+    """
+    This class is a ring of fixed-size frame slots in shared memory, to hand
+    frames from a capture process to the analysis workers without pickling
+    them. A frame is written once in a free slot and only the slot index is
+    sent to the worker, which reads it as a numpy view and releases the slot.
+
+    The ring is passed to the worker processes as an argument of
+    multiprocessing.Process, and they attach to the same memory.
+    """
+
+    def __init__(self, slots=8, max_shape=(1080, 1920, 3)):
+        self.slots = slots
+        self.slot_size = int(np.prod(max_shape))
+        self._data_offset = self._align(slots * HEADER_FIELDS * 4)
+
+        self._memory = shared_memory.SharedMemory(create=True, size=self._data_offset + slots * self.slot_size)
+        self._owner_pid = os.getpid()
+        self._free = multiprocessing.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+
+        self._map()
+
+    @staticmethod
+    def _align(size):
+        return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+    def _map(self):
+        buffer = self._memory.buf
+        self._headers = np.ndarray((self.slots, HEADER_FIELDS), np.int32, buffer)
+        self._data = np.ndarray((self.slots, self.slot_size), np.uint8, buffer, self._data_offset)
+
+    def __getstate__(self):
+        return {'slots': self.slots, 'slot_size': self.slot_size, 'data_offset': self._data_offset,
+                'name': self._memory.name, 'free': self._free}
+
+    def __setstate__(self, state):
+        self.slots = state['slots']
+        self.slot_size = state['slot_size']
+        self._data_offset = state['data_offset']
+        self._free = state['free']
+        self._memory = _attach(state['name'])
+        self._owner_pid = None
+        self._map()
+
+    def write(self, frame, timeout=None):
+        """Copies a frame in a free slot and returns the index of the slot.
+        Waits for a free slot when every slot is used by the workers.
+
+        Arguments:
+            frame (numpy.ndarray): uint8 frame, not bigger than max_shape
+            timeout (float): Seconds to wait for a free slot, None to wait forever
+        """
+        if frame.dtype != np.uint8 or frame.size > self.slot_size:
+            raise ValueError('frame must be uint8 and fit in a slot of %d bytes' % self.slot_size)
+
+        slot = self._free.get(True, timeout)
+        shape = frame.shape + (1,) * (HEADER_FIELDS - frame.ndim)
+        self._headers[slot] = shape
+        self._data[slot, :frame.size].reshape(frame.shape)[...] = frame
+        return slot
+
+    def view(self, slot):
+        """Returns the frame of a slot as a numpy view on the shared memory,
+        valid until the slot is released
+        """
+        height, width, channels = self._headers[slot]
+        frame = self._data[slot, :height * width * channels]
+        if channels == 1:
+            return frame.reshape(height, width)
+        return frame.reshape(height, width, channels)
+
+    def release(self, slot):
+        """Gives the slot back to the ring once the frame is analyzed"""
+        self._free.put(slot)
+
+    def close(self):
+        """Detaches this process from the shared memory, and frees it
+        when called by the process which created the ring
+        """
+        self._headers = None
+        self._data = None
+        self._memory.close()
+        # fork 로 만든 worker 도 같은 객체를 가지므로 pid 로 만든 process 인지 확인
+        if self._owner_pid == os.getpid():
+            self._memory.unlink()
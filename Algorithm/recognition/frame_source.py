@@ -0,0 +1,331 @@
+import os
+import queue
+import re
+import socket
+import struct
+import sys
+import threading
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+# stream 의 frame header: 종류, 너비, 높이, payload 길이
+FRAME_HEADER = struct.Struct('!BHHI')
+ENCODED_FRAME = 0
+RAW_FRAME = 1
+
+
+def natural_key(name):
+    """Returns the sort key of a file name in natural order,
+    ex) 'test (2).png' before 'test (10).png'
+    """
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+
+def image_names(directory):
+    """Returns the names of the images of a directory, in natural order"""
+    names = [name for name in os.listdir(directory) if name.lower().endswith(IMAGE_EXTENSIONS)]
+    return sorted(names, key=natural_key)
+
+
+class FrameSource(object):
+    """
+    This class is the base of the frame sources. A source is iterated
+    to get the BGR frames (numpy.ndarray) one after the other, and
+    closed when it is not needed anymore.
+    """
+
+    def frames(self):
+        """Generator of the frames of the source"""
+        raise NotImplementedError
+
+    def __iter__(self):
+        return self.frames()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class CaptureSource(FrameSource):
+    """
+    Frames of a cv2.VideoCapture: a camera device index or a video file
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self._capture = None
+
+    def frames(self, wanted=None):
+        """Generator of the frames of the capture.
+
+        Argument:
+            wanted (threading.Event): Set when a frame is wanted, optional. The frames
+                grabbed while it is not set are skipped without being decoded (live cameras)
+        """
+        self._capture = cv2.VideoCapture(self.device)
+        try:
+            while self._capture.grab():
+                if wanted is not None:
+                    if not wanted.is_set():
+                        continue
+                    wanted.clear()
+                ok, frame = self._capture.retrieve()
+                if not ok:
+                    break
+                yield frame
+        finally:
+            self.close()
+
+    def close(self):
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+
+class DeviceSource(CaptureSource):
+    """Frames of a camera, ex) DeviceSource(0) for the default webcam"""
+
+    def __init__(self, index=0):
+        super(DeviceSource, self).__init__(int(index))
+
+
+class VideoFileSource(CaptureSource):
+    """Frames of a video file"""
+
+    def __init__(self, path):
+        super(VideoFileSource, self).__init__(path)
+
+
+class ImageDirectorySource(FrameSource):
+    """
+    Frames of the images of a directory, in natural order
+    (ex: 'test (2).png' before 'test (10).png')
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def frames(self):
+        for name in image_names(self.directory):
+            frame = cv2.imread(os.path.join(self.directory, name))
+            if frame is not None:
+                yield frame
+
+
+class StreamSource(FrameSource):
+    """
+    Frames received on a binary stream (ex: a pipe from the web server).
+    Each frame is a FRAME_HEADER (kind, width, height, length) followed by
+    'length' bytes: an encoded image (JPEG, PNG) when kind is ENCODED_FRAME,
+    or width * height * 3 BGR bytes when kind is RAW_FRAME.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    @staticmethod
+    def _read_exactly(stream, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = stream.read(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def frames(self):
+        while True:
+            header = self._read_exactly(self.stream, FRAME_HEADER.size)
+            if header is None:
+                break
+            kind, width, height, length = FRAME_HEADER.unpack(bytes(header))
+
+            payload = self._read_exactly(self.stream, length)
+            if payload is None:
+                break
+
+            if kind == RAW_FRAME:
+                yield np.frombuffer(payload, np.uint8).reshape(height, width, 3)
+            else:
+                frame = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+                if frame is not None:
+                    yield frame
+
+    def close(self):
+        self.stream.close()
+
+
+class SocketSource(StreamSource):
+    """
+    Frames sent by one client connecting to a TCP socket, with the
+    protocol of StreamSource
+    """
+
+    def __init__(self, host='127.0.0.1', port=9000):
+        super(SocketSource, self).__init__(None)
+        self.host = host
+        self.port = port
+        self._server = None
+        self._connection = None
+
+    def frames(self):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.host, self.port))
+        self._server.listen(1)
+
+        try:
+            self._connection, _ = self._server.accept()
+            self.stream = self._connection.makefile('rb')
+            for frame in super(SocketSource, self).frames():
+                yield frame
+        finally:
+            self.close()
+
+    def close(self):
+        for resource in (self.stream, self._connection, self._server):
+            if resource is not None:
+                resource.close()
+        self.stream = self._connection = self._server = None
+
+
+def encode_frame(frame, encoding='.jpg'):
+    """Returns the bytes to send a frame to a StreamSource.
+
+    Arguments:
+        frame (numpy.ndarray): BGR frame
+        encoding (str): Image extension used to encode the frame, None to send it raw
+    """
+    height, width = frame.shape[:2]
+    if encoding is None:
+        payload = np.ascontiguousarray(frame, np.uint8).tobytes()
+        return FRAME_HEADER.pack(RAW_FRAME, width, height, len(payload)) + payload
+
+    payload = cv2.imencode(encoding, frame)[1].tobytes()
+    return FRAME_HEADER.pack(ENCODED_FRAME, width, height, len(payload)) + payload
+
+
+class _SourceError(object):
+    def __init__(self, error):
+        self.error = error
+
+
+class BufferedSource(FrameSource):
+    """
+    Reads another source in a background thread into a bounded buffer,
+    so the analysis loop takes frames without waiting on the camera, the
+    disk or the network. With drop=True (live sources) the oldest frame
+    is dropped when the buffer is full, otherwise the reader waits.
+    A live camera (DeviceSource) keeps grabbing its frames, and only the
+    frame grabbed after the analysis loop asks for one is decoded.
+    The source is read and closed only by the background thread.
+    """
+
+    _END = object()
+
+    def __init__(self, source, size=4, drop=False, join_timeout=1.0):
+        self.source = source
+        self.size = size
+        self.drop = drop
+        self.join_timeout = join_timeout
+        self.dropped = 0
+        self._buffer = queue.Queue(maxsize=size)
+        self._stopped = threading.Event()
+        self._wanted = None
+        if drop and isinstance(source, DeviceSource):
+            self._wanted = threading.Event()
+        self._thread = None
+
+    def _put(self, item):
+        droppable = self.drop and not (item is self._END or isinstance(item, _SourceError))
+        while not self._stopped.is_set():
+            try:
+                if droppable:
+                    self._buffer.put_nowait(item)
+                else:
+                    self._buffer.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if droppable:
+                    try:
+                        self._buffer.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def _read(self):
+        if self._wanted is not None:
+            frames = self.source.frames(self._wanted)
+        else:
+            frames = iter(self.source)
+        try:
+            for frame in frames:
+                if self._stopped.is_set():
+                    break
+                self._put(frame)
+        except Exception as error:
+            self._put(_SourceError(error))
+        finally:
+            # source 는 읽는 thread 에서 닫기 (read 중에 다른 thread 가 닫지 않게)
+            if hasattr(frames, 'close'):
+                frames.close()
+            self.source.close()
+        self._put(self._END)
+
+    def frames(self):
+        self._thread = threading.Thread(target=self._read)
+        self._thread.daemon = True
+        self._thread.start()
+
+        try:
+            while True:
+                if self._wanted is not None:
+                    self._wanted.set()
+                item = self._buffer.get()
+                if item is self._END:
+                    break
+                if isinstance(item, _SourceError):
+                    raise item.error
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        """Stops the background thread, which closes the source. A read
+        blocked longer than join_timeout (ex: a socket waiting for its
+        client) closes the source when it returns.
+        """
+        self._stopped.set()
+        if self._thread is None:
+            self.source.close()
+            return
+        if self._wanted is not None:
+            # 다음 grab 에서 frame 을 넘겨야 멈춘 것을 확인함
+            self._wanted.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join(self.join_timeout)
+
+
+def open_source(argument):
+    """Returns the source named by a command line argument: a camera index
+    ('0'), '-' for frames piped on the standard input, host:port for a
+    socket, a directory of images or a video file.
+    """
+    argument = str(argument)
+    if argument.isdigit():
+        return DeviceSource(int(argument))
+    if argument == '-':
+        return StreamSource(sys.stdin.buffer)
+    if os.path.isdir(argument):
+        return ImageDirectorySource(argument)
+    host, _, port = argument.rpartition(':')
+    if host and port.isdigit() and not os.path.exists(argument):
+        return SocketSource(host, int(port))
+    return VideoFileSource(argument)
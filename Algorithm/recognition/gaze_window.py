@@ -0,0 +1,114 @@
+from __future__ import division
+import collections
+import math
+
+CENTER, LEFT, RIGHT, BLINKING = 0, 1, 2, 3
+
+# window 하나의 결과: 시작 key, gaze 별 횟수 (center, left, right, blinking), 가장 많은 gaze
+GazeRecord = collections.namedtuple('GazeRecord', ['start', 'counts', 'winner'])
+
+
+def gaze_code(sample):
+    """Returns the gaze code of a GazeSample (0: center, 1: left, 2: right,
+    3: blinking) or None when the pupils are not located
+    """
+    if sample.is_center:
+        return CENTER
+    elif sample.is_left:
+        return LEFT
+    elif sample.is_right:
+        return RIGHT
+    elif sample.is_blinking:
+        return BLINKING
+    return None
+
+
+def winner(counts):
+    """Returns the most frequent gaze code of the counts, the smallest code
+    on equality and BLINKING when nothing was counted (no pupils found)
+    """
+    if not any(counts):
+        return BLINKING
+    return counts.index(max(counts))
+
+
+class GazeWindow(object):
+    """
+    This class counts the gaze codes of the samples in windows keyed on
+    tick (or frame timestamp): window i covers the keys in
+    [i * hop, i * hop + window). A GazeRecord is emitted for every window
+    starting from the last one containing the first sample, once a later key shows it is over, so the
+    records depend only on the keys and not on when they are processed.
+
+    ex) windows = GazeWindow(window=3, hop=3)
+        for record in windows.stream((tick, code) for ...):
+            ...
+    """
+
+    def __init__(self, window=1, hop=None):
+        self.window = window
+        self.hop = hop or window
+        self._counts = {}
+        self._next = None
+        self._last = None
+
+    def _first(self, key):
+        """Index of the first window containing the key"""
+        return int(math.floor((key - self.window) / self.hop)) + 1
+
+    def _index(self, key):
+        """Index of the last window containing the key"""
+        return int(math.floor(key / self.hop))
+
+    def _emit(self, stop):
+        records = []
+        while self._next is not None and self._next < stop:
+            counts = tuple(self._counts.pop(self._next, (0, 0, 0, 0)))
+            records.append(GazeRecord(self._next * self.hop, counts, winner(counts)))
+            self._next += 1
+        return records
+
+    def add(self, key, code):
+        """Counts the gaze code of a sample and returns the records of the
+        windows over before this key.
+
+        Arguments:
+            key (float): Tick or timestamp of the sample, never smaller than the previous one
+            code (int): Gaze code of the sample, None when the pupils were not located
+        """
+        if self._last is not None and key < self._last:
+            raise ValueError('gaze samples must be added in order of key')
+        self._last = key
+
+        first = self._first(key)
+        if self._next is None:
+            # 첫 sample 보다 먼저 시작하는 window 는 만들지 않음
+            self._next = self._index(key)
+        records = self._emit(first)
+
+        if code is not None:
+            for index in range(max(first, self._next), self._index(key) + 1):
+                self._counts.setdefault(index, [0, 0, 0, 0])[code] += 1
+        return records
+
+    def current(self):
+        """Returns the record of the last window with a sample, so far"""
+        if self._last is None:
+            return None
+        index = self._index(self._last)
+        counts = tuple(self._counts.get(index, (0, 0, 0, 0)))
+        return GazeRecord(index * self.hop, counts, winner(counts))
+
+    def flush(self):
+        """Returns the records of every window still open"""
+        if self._last is None:
+            return []
+        return self._emit(self._index(self._last) + 1)
+
+    def stream(self, samples):
+        """Generator of the records of (key, code) samples, one per window"""
+        for key, code in samples:
+            for record in self.add(key, code):
+                yield record
+        for record in self.flush():
+            yield record
@@ -0,0 +1,200 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+# 초 단위 histogram bucket
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram(object):
+    """
+    This class counts durations in fixed buckets, with their sum and count
+    """
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative(self):
+        """Returns [(upper bound, number of values <= bound)], the last bound is '+Inf'"""
+        result = []
+        total = 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class Timer(object):
+    """
+    Context manager adding the time spent in its block to a histogram
+    """
+
+    __slots__ = ('_histogram', '_lock', '_start')
+
+    def __init__(self, histogram, lock):
+        self._histogram = histogram
+        self._lock = lock
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        seconds = time.perf_counter() - self._start
+        with self._lock:
+            self._histogram.observe(seconds)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics(object):
+    """
+    This class keeps the latency histograms of each stage of the pipeline
+    and some counters, per room and per student, and exports them in the
+    Prometheus text format or in JSON. It can be updated from several
+    threads (ex: the write-behind thread of the store) while it is exported.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix='uume'):
+        self.buckets = buckets
+        self.prefix = prefix
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, stage, room, student):
+        key = (stage, room, student)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = Histogram(self.buckets)
+            self.histograms[key] = histogram
+        return histogram
+
+    def histogram(self, stage, room='', student=''):
+        """Returns the histogram of a stage for a student"""
+        with self._lock:
+            return self._histogram(stage, room, student)
+
+    def observe(self, stage, seconds, room='', student=''):
+        with self._lock:
+            self._histogram(stage, room, student).observe(seconds)
+
+    def timer(self, stage, room='', student=''):
+        """Returns a context manager timing its block for the stage
+
+        ex) with metrics.timer('db_write', room, student):
+                store.append(...)
+        """
+        return Timer(self.histogram(stage, room, student), self._lock)
+
+    def increment(self, name, room='', student='', value=1):
+        key = (name, room, student)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe_tick(self, room, student, analysis, gaze=None, state=None):
+        """Records the timings of one analyzed tick.
+
+        Arguments:
+            room (str): Room name
+            student (str): Student id
+            analysis (FrameAnalysis): Analysis of the frame, with its timings
+            gaze (GazeTracking): Gaze tracking refreshed with the frame, optional
+            state (StudentState): State updated with the frame, optional
+        """
+        self.increment('ticks', room, student)
+        if analysis.detected:
+            self.increment('detections', room, student)
+        if not analysis.face_found:
+            self.increment('faces_missing', room, student)
+
+        for stage, seconds in analysis.timings.items():
+            self.observe(stage, seconds, room, student)
+
+        if gaze is not None:
+            for eye in (gaze.eye_left, gaze.eye_right):
+                if eye is not None:
+                    for stage, seconds in eye.timings.items():
+                        self.observe(stage, seconds, room, student)
+
+        if state is not None:
+            for stage, seconds in state.timings.items():
+                self.observe(stage, seconds, room, student)
+
+    def _labels(self, room, student, **extra):
+        labels = [('room', room), ('student', student)] + sorted(extra.items())
+        return '{' + ','.join('%s="%s"' % (name, _escape(value)) for name, value in labels) + '}'
+
+    def to_prometheus(self):
+        """Returns the metrics in the Prometheus text format"""
+        with self._lock:
+            return self._to_prometheus()
+
+    def _to_prometheus(self):
+        lines = []
+        name = self.prefix + '_stage_seconds'
+        lines.append('# HELP %s Time spent in each stage of the pipeline' % name)
+        lines.append('# TYPE %s histogram' % name)
+        for (stage, room, student), histogram in sorted(self.histograms.items()):
+            for bound, count in histogram.cumulative():
+                lines.append('%s_bucket%s %d' % (name, self._labels(room, student, stage=stage, le=bound), count))
+            lines.append('%s_sum%s %.9f' % (name, self._labels(room, student, stage=stage), histogram.sum))
+            lines.append('%s_count%s %d' % (name, self._labels(room, student, stage=stage), histogram.count))
+
+        for counter in sorted(set(key[0] for key in self.counters)):
+            name = self.prefix + '_' + counter + '_total'
+            lines.append('# TYPE %s counter' % name)
+            for (counter_name, room, student), value in sorted(self.counters.items()):
+                if counter_name == counter:
+                    lines.append('%s%s %d' % (name, self._labels(room, student), value))
+
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self):
+        """Returns the metrics as {room: {student: {stage or counter: values}}}"""
+        with self._lock:
+            return self._to_dict()
+
+    def _to_dict(self):
+        result = {}
+        for (stage, room, student), histogram in self.histograms.items():
+            result.setdefault(room, {}).setdefault(student, {})[stage] = {
+                'count': histogram.count,
+                'sum': histogram.sum,
+                'mean': histogram.sum / histogram.count if histogram.count else 0.0,
+                'buckets': [[bound, count] for bound, count in histogram.cumulative()],
+            }
+        for (counter, room, student), value in self.counters.items():
+            result.setdefault(room, {}).setdefault(student, {})[counter] = value
+        return result
+
+    @staticmethod
+    def _write(path, text):
+        # 읽는 쪽에서 반쯤 쓰인 파일을 보지 않도록 다른 이름으로 쓰고 바꾸기
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(path + '.tmp', 'w') as metrics_file:
+            metrics_file.write(text)
+        os.replace(path + '.tmp', path)
+
+    def write_prometheus(self, path):
+        self._write(path, self.to_prometheus())
+
+    def write_json(self, path):
+        self._write(path, json.dumps(self.to_dict(), indent=2))
@@ -0,0 +1,53 @@
+from __future__ import division
+from array import array
+
+
+class MovingStats(object):
+    """
+    This class keeps the last values of a check in a fixed-size
+    window with a running sum, so that updating the moving average
+    costs the same whatever the size of the window.
+    """
+
+    __slots__ = ('length', 'count', 'sum', '_window', '_index')
+
+    def __init__(self, length=10):
+        self.length = length
+        self.count = 0
+        self.sum = 0.0
+        self._window = array('d', [0.0]) * length
+        self._index = 0
+
+    @property
+    def full(self):
+        """Returns true once the window holds 'length' values"""
+        return self.count == self.length
+
+    @property
+    def average(self):
+        """Returns the average of the values in the window"""
+        if self.count == 0:
+            return 0.0
+        return self.sum / self.count
+
+    def update(self, value):
+        """Pushes a value in the window, dropping the oldest one if the
+        window is full, and returns the new moving average.
+
+        Argument:
+            value (float): New value of the check
+        """
+        if self.full:
+            self.sum -= self._window[self._index]
+        else:
+            self.count += 1
+
+        self._window[self._index] = value
+        self.sum += value
+        self._index = (self._index + 1) % self.length
+
+        if self._index == 0:
+            # 한 바퀴마다 합을 다시 계산해서 float 오차가 쌓이지 않게
+            self.sum = sum(self._window[:self.count])
+
+        return self.sum / self.count
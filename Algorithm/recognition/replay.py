@@ -0,0 +1,405 @@
+from __future__ import division
+import contextlib
+import copy
+import multiprocessing
+import os
+import time
+import cv2
+from gaze_tracking import GazeTracking, get_face_detector, get_predictor, preload_models
+from .frame_source import image_names
+from .scheduler import SamplingScheduler
+from .session import ABSENT
+from .student_state import StudentState
+
+SERIES = ('in_seat', 'tilted', 'face_closer', 'gaze')
+
+
+def video_info(path):
+    """Returns (number of frames, frames per second) of a video file or
+    of a directory of images. The frames per second are None when unknown.
+    """
+    if os.path.isdir(path):
+        return len(image_names(path)), None
+    capture = cv2.VideoCapture(path)
+    try:
+        return int(capture.get(cv2.CAP_PROP_FRAME_COUNT)), capture.get(cv2.CAP_PROP_FPS) or None
+    finally:
+        capture.release()
+
+
+def read_frames(path, start=0, stop=None, step=1, seek=True):
+    """Generator of the (index, frame) of the frames [start, stop) of a
+    video file or a directory of images, one every 'step' frames.
+
+    Arguments:
+        path (str): Video file or directory of images
+        start (int): Index of the first frame
+        stop (int): Index after the last frame, None for the end of the video
+        step (int): Frames between two frames read
+        seek (bool): Seek to 'start' in the video instead of decoding the frames before it
+    """
+    if os.path.isdir(path):
+        names = image_names(path)
+        stop = len(names) if stop is None else min(stop, len(names))
+        for index in range(start, stop, step):
+            frame = cv2.imread(os.path.join(path, names[index]))
+            if frame is not None:
+                yield index, frame
+        return
+
+    capture = cv2.VideoCapture(path)
+    try:
+        index = 0
+        if start and seek:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+            if int(capture.get(cv2.CAP_PROP_POS_FRAMES)) == start:
+                index = start
+            else:
+                # seek 를 지원하지 않으면 처음부터 다시 읽음
+                capture.release()
+                capture = cv2.VideoCapture(path)
+
+        while stop is None or index < stop:
+            if index < start or (index - start) % step:
+                # 건너뛰는 frame 은 decode 하지 않음
+                ok = capture.grab()
+            else:
+                ok, frame = capture.read()
+                if ok:
+                    yield index, frame
+            if not ok:
+                break
+            index += 1
+    finally:
+        capture.release()
+
+
+def stitch(results):
+    """Returns the series {name: chars} of the (tick, result) of the frames,
+    in order, with the rules of the live session: the last result of a
+    tick is kept, the ticks without frame carry the previous result and
+    the ticks before the first frame are absent.
+
+    Arguments:
+        results (list): (tick, result) of the analyzed frames, in order
+    """
+    chars = dict((name, []) for name in SERIES)
+
+    def write(result, count):
+        for name in SERIES:
+            chars[name].append(result[name] * count)
+
+    tick = 0
+    pending = None
+    for frame_tick, result in results:
+        if frame_tick > tick:
+            write(pending or ABSENT, frame_tick - tick)
+            tick = frame_tick
+        pending = result
+    if pending is not None:
+        write(pending, 1)
+
+    return dict((name, ''.join(values)) for name, values in chars.items())
+
+
+class FrameRecord(object):
+    """
+    This class keeps what StudentState.update reads from the analysis
+    and the gaze tracking of one frame: the faces, their landmarks and
+    the GazeSample. It is small and picklable, so the frames can be
+    analyzed in other processes and checked in order afterwards.
+
+    ex) state.update(record, record, tick)
+    """
+
+    def __init__(self, analysis, sample):
+        self.faces = [(face.left(), face.top(), face.right(), face.bottom()) for face in analysis.faces]
+        self.points = [analysis.landmark_points(index) for index in range(len(analysis.faces))]
+        self.sample = sample
+
+    def landmark_points(self, index=0):
+        return self.points[index]
+
+
+def _warm_models(predictor_path):
+    # pool 의 process 마다 시작할 때 모델 load (fork 면 부모가 load 한 모델)
+    get_face_detector()
+    get_predictor(predictor_path)
+
+
+def _replay_chunk(task):
+    replay, start, stop, calibration = task
+    return replay.analyze_chunk(start, stop, calibration)
+
+
+class OfflineReplay(object):
+    """
+    This class replays a recorded class video faster than real time, to
+    fill the series of a student from a recording or to compute them again
+    with other thresholds.
+
+    The frames are analyzed like in RecognitionSession.process with
+    redetect_seconds=0: the faces are detected on every analyzed frame, so
+    the analysis of a frame (faces, landmarks and gaze) doesn't depend on
+    the frames before it. This is the expensive part, it runs on chunks of
+    the video in parallel in a pool of processes which load the models
+    once. The checks of StudentState, which keep moving windows over the
+    whole video, run afterwards here, on the FrameRecord of the frames in
+    order.
+
+    With 'sampling' the frames given to StudentState are chosen like in a
+    live session: a SamplingScheduler runs on the time of the frames in the
+    video and a frame is used when the scheduler would have sampled it
+    (every 1 to 6 seconds by default). The chunks analyze every frame of
+    the grid of the fast interval ('step' frames), which holds every frame
+    the scheduler can pick. Without 'sampling' every 'step' frame is used.
+    The CPU budget of the host is not used.
+
+    The calibration is done on the beginning of the video, before the
+    chunks, like a live session. So the series are the same as the ones of
+    a live session with redetect_seconds=0 reading the video (run_live()),
+    whatever the number of processes.
+
+    ex) result = OfflineReplay('class.mp4', processes=8).run()
+        result['series']['gaze'], result['fps']
+    """
+
+    def __init__(self, path, processes=None, chunk_frames=None, step=None, fps=None, period=3.0,
+                 TH_threshold=25, FC_threshold=20, detection_scale=1.0, predictor_path=None,
+                 pupil_method='contours', seek=True, quiet=True, sampling=True, scheduler=None):
+        """
+        Arguments:
+            path (str): Video file or directory of images
+            processes (int): Number of processes, the number of cores by default
+            chunk_frames (int): Frames per chunk, two chunks per process by default
+            step (int): Analyze one frame every 'step' frames, by default the frames
+                of the fast interval of the scheduler with 'sampling', every frame without
+            fps (float): Frames per second of the video, read from the video by default (30 for images)
+            period (float): Seconds of a tick, like SamplingScheduler
+            quiet (bool): Hide the prints of the checks
+            sampling (bool): Use the frames the scheduler of a live session would sample
+            scheduler (SamplingScheduler): Intervals of the live sessions, SamplingScheduler(period) by default
+        """
+        self.path = path
+        self.processes = processes or multiprocessing.cpu_count()
+        self.chunk_frames = chunk_frames
+        self.step = step
+        self.fps = fps
+        self.sampling = sampling
+        # 영상의 시각으로 tick 과 sample 을 정함 (영상 시작이 tick 0, host 의 CPU budget 은 사용하지 않음)
+        self.scheduler = copy.copy(scheduler) if scheduler is not None else SamplingScheduler(period)
+        self.scheduler.origin = 0.0
+        self.scheduler.budget = None
+        self.scheduler.last_sample = None
+        self.TH_threshold = TH_threshold
+        self.FC_threshold = FC_threshold
+        self.detection_scale = detection_scale
+        self.predictor_path = predictor_path
+        self.pupil_method = pupil_method
+        self.seek = seek
+        self.quiet = quiet
+
+    def tick_of(self, index):
+        """Returns the tick of a frame of the video"""
+        return self.scheduler.tick_of(index / self.fps)
+
+    def _new_state(self):
+        # 매 frame 얼굴 검출 (이전 frame 의 추적 결과를 사용하지 않음)
+        return StudentState(self.TH_threshold, self.FC_threshold, redetect_seconds=0,
+                            detection_scale=self.detection_scale)
+
+    def _prepare(self):
+        """Reads the frames per second and the step from the video, and loads the models"""
+        frame_count, video_fps = video_info(self.path)
+        if self.fps is None:
+            self.fps = video_fps or 30.0
+        if self.step is None:
+            # sampling 이면 scheduler 가 고를 수 있는 frame (fast interval 마다) 만 분석
+            self.step = max(int(round(self.scheduler.fast_interval * self.fps)), 1) if self.sampling else 1
+        # 모델은 fork 전에 한 번 load 해서 모든 process 가 같이 사용
+        preload_models(self.predictor_path)
+        return frame_count
+
+    @contextlib.contextmanager
+    def _quiet(self):
+        # StudentState 검사의 print 숨기기
+        if not self.quiet:
+            yield
+            return
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            yield
+
+    def _due(self, scheduler, index):
+        """Returns True when the scheduler of a live session would sample the frame"""
+        if not self.sampling or scheduler.last_sample is None:
+            return True
+        # frame 사이의 시각은 가장 가까운 frame 으로
+        return index / self.fps >= scheduler.next_sample() - 0.5 * self.step / self.fps
+
+    def _sample(self, state, scheduler, index, record):
+        """Checks a sampled frame like RecognitionSession.process, returns (tick, result)"""
+        tick = self.tick_of(index)
+        result = state.update(record, record, tick)
+        scheduler.observe(state.headAngle, state.faceLength, record.sample.horizontal_ratio)
+        scheduler.last_sample = index / self.fps
+        return tick, result
+
+    def _live(self, state, scheduler, results, until=None):
+        """Analyzes and checks the frames one by one from the start of the
+        video, only the sampled ones like a live session. Returns the index
+        of the frame where until() became True, None at the end of the video.
+        """
+        frames = read_frames(self.path, 0, None, self.step, self.seek)
+
+        def sample(index, record):
+            results.append(self._sample(state, scheduler, index, record))
+
+        with self._quiet():
+            _, stopped = self._analyze(frames, state.tracker, state.calibration, until=until,
+                                       select=lambda index: self._due(scheduler, index), observe=sample)
+        return stopped
+
+    def run_live(self):
+        """Replays the whole video in this process like a live session with
+        redetect_seconds=0, analyzing only the sampled frames, and returns
+        the series {name: chars}. Slower than run(), to check its series.
+        """
+        self._prepare()
+        results = []
+        self._live(self._new_state(), copy.copy(self.scheduler), results)
+        return stitch(results)
+
+    def _analyze(self, frames, tracker, calibration, until=None, select=None, observe=None):
+        """Analyzes the frames, returns their (index, FrameRecord) and the index
+        of the frame where until() became True (None at the end of the frames).
+        Only the frames where select(index) is True are analyzed, and
+        observe(index, record) is called after each of them.
+        """
+        face_detector = get_face_detector()
+        predictor = get_predictor(self.predictor_path)
+        gaze = GazeTracking(face_detector=face_detector, predictor=predictor, pupil_method=self.pupil_method)
+        gaze.calibration = calibration
+        records = []
+        stopped = None
+
+        try:
+            for index, frame in frames:
+                if until is not None and until():
+                    stopped = index
+                    break
+                if select is not None and not select(index):
+                    continue
+
+                # RecognitionSession.process 와 같은 순서로 분석
+                analysis = tracker.analyze(frame, face_detector, predictor, index / self.fps)
+                gaze.refresh(frame, analysis)
+                record = FrameRecord(analysis, gaze.sample)
+                if observe is not None:
+                    observe(index, record)
+                records.append((index, record))
+        finally:
+            frames.close()
+
+        return records, stopped
+
+    def analyze_chunk(self, start, stop, calibration):
+        """Analyzes the frames [start, stop) of the video and returns their
+        (index, FrameRecord)
+
+        Arguments:
+            start (int): First frame of the chunk
+            stop (int): Frame after the chunk, None for the end of the video
+            calibration (Calibration): Completed calibration of the student
+        """
+        frames = read_frames(self.path, start, stop, self.step, self.seek)
+        records, _ = self._analyze(frames, self._new_state().tracker, calibration)
+        return records
+
+    def _chunks(self, position, frame_count):
+        """Returns the (start, stop) of the chunks from the frame 'position'"""
+        if not frame_count or frame_count <= position or self.processes == 1:
+            return [(position, None)]
+
+        size = self.chunk_frames
+        if size is None:
+            size = -(-(frame_count - position) // (self.processes * 2))
+        # chunk 의 첫 frame 이 분석하는 frame 이 되게 step 의 배수로 맞춤
+        size = max(-(-size // self.step) * self.step, self.step)
+
+        starts = list(range(position, frame_count, size))
+        return list(zip(starts, starts[1:] + [None]))
+
+    def run(self):
+        """Replays the video and returns a dict with the 'series' {name: chars},
+        the number of 'frames' analyzed and of 'samples' checked, the
+        'seconds' taken, the 'fps', the 'realtime' speed (seconds of video
+        per second) and the number of 'chunks'
+        """
+        started = time.perf_counter()
+        frame_count = self._prepare()
+
+        # calibration 이 끝날 때까지는 처음부터 live session 처럼 차례대로 분석
+        state = self._new_state()
+        scheduler = copy.copy(self.scheduler)
+        results = []
+        position = self._live(state, scheduler, results, until=state.calibration.is_complete)
+        analyzed = len(results)
+
+        records = []
+        chunks = []
+        if position is not None:
+            chunks = self._chunks(position, frame_count)
+            tasks = [(self, start, stop, state.calibration) for start, stop in chunks]
+
+            pool = None
+            if len(tasks) == 1:
+                outputs = map(_replay_chunk, tasks)
+            else:
+                if 'fork' in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context('fork')
+                else:
+                    context = multiprocessing.get_context()
+                pool = context.Pool(min(self.processes, len(tasks)), _warm_models, (self.predictor_path,))
+                outputs = pool.imap(_replay_chunk, tasks)
+
+            try:
+                for chunk_records in outputs:
+                    records.extend(chunk_records)
+            finally:
+                if pool is not None:
+                    pool.close()
+                    pool.join()
+
+        # 고개, 거리, gaze 검사는 frame 순서대로 (moving window 가 video 전체에 이어짐)
+        # live session 의 scheduler 가 고르는 frame 만 검사
+        with self._quiet():
+            for index, record in records:
+                if self._due(scheduler, index):
+                    results.append(self._sample(state, scheduler, index, record))
+
+        analyzed += len(records)
+        seconds = time.perf_counter() - started
+        video_seconds = (results[-1][0] + 1) * self.scheduler.period if results else 0.0
+        return {
+            'series': stitch(results),
+            'frames': analyzed,
+            'samples': len(results),
+            'seconds': seconds,
+            'fps': analyzed / seconds if seconds else 0.0,
+            'realtime': video_seconds / seconds if seconds else 0.0,
+            'chunks': max(len(chunks), 1),
+        }
+
+
+def write_series(store, path, series):
+    """Appends replayed series to a store, from tick 0, and packs them
+
+    Arguments:
+        store (SeriesStore): Store of the series
+        path (str): Path of the student in the store
+        series (dict): {name: chars} returned by OfflineReplay.run
+    """
+    length = len(series[SERIES[0]])
+    store.append_many((path, tick, dict((name, series[name][tick]) for name in SERIES))
+                      for tick in range(length))
+    store.pack(path, SERIES)
@@ -0,0 +1,108 @@
+from __future__ import division
+
+# 요약할 bucket 크기 (분)
+BUCKET_MINUTES = (1, 5, 15)
+FIELDS = ('ticks', 'in_seat', 'concentrated', 'tilted', 'face_closer', 'understood')
+
+
+def index_path(class_path):
+    """Returns the entry of a class in the index of the classes,
+    ex) 'class_v2/<teacher>/<date>/<class>' -> 'class_index/<teacher>/<date>/<class>'
+    The dashboard reads class_index/<teacher> to list the dates and classes.
+    """
+    return 'class_index/' + class_path.strip('/').split('/', 1)[1]
+
+
+def tick_flags(result):
+    """Returns the 0/1 value of each field of FIELDS for the result of one tick,
+    with the rules of the educator chart (chart.html): a student is
+    concentrated when in seat and the gaze is not '0', and understands
+    when concentrated without tilting the head or getting closer.
+
+    Argument:
+        result (dict): Chars of the tick {'in_seat', 'tilted', 'face_closer', 'gaze'}
+    """
+    in_seat = '1' in result.get('in_seat', '')
+    tilted = '1' in result.get('tilted', '')
+    face_closer = '1' in result.get('face_closer', '')
+    concentrated = in_seat and result.get('gaze', '0') != '0'
+    understood = concentrated and not (tilted or face_closer)
+
+    return {'ticks': 1, 'in_seat': int(in_seat), 'concentrated': int(concentrated),
+            'tilted': int(tilted), 'face_closer': int(face_closer), 'understood': int(understood)}
+
+
+class Rollups(object):
+    """
+    This class turns the result of each tick of a student into counter
+    increments of the rollups of the student and of the class, in buckets
+    of 1, 5 and 15 minutes:
+
+        <class>/rollup/<minutes>m/<bucket>/<field>
+        <class>/<student>/rollup/<minutes>m/<bucket>/<field>
+
+    The counters are added with SeriesStore.increment, so the students of
+    a class update the same class rollup without reading it, and the
+    dashboard reads a few counters instead of every series.
+    """
+
+    def __init__(self, class_path, student, period=3.0, minutes=BUCKET_MINUTES):
+        self.class_path = class_path.strip('/')
+        self.student = student
+        self.period = period
+        self.minutes = minutes
+
+    @staticmethod
+    def bucket_key(bucket):
+        return '%04d' % bucket
+
+    def bucket_of(self, tick, minutes):
+        """Returns the index of the bucket of 'minutes' minutes holding the tick"""
+        return int(tick * self.period // (minutes * 60))
+
+    def joined(self):
+        """Returns the counters of a student joining the class: the number
+        of joins in the index of the classes
+        """
+        return {index_path(self.class_path) + '/joins': 1}
+
+    def counters(self, tick, result):
+        """Returns the {counter path: increment} of one tick"""
+        flags = tick_flags(result)
+        student_path = self.class_path + '/' + self.student
+
+        counters = {}
+        for minutes in self.minutes:
+            bucket = '/rollup/%dm/' % minutes + self.bucket_key(self.bucket_of(tick, minutes)) + '/'
+            for field, value in flags.items():
+                if value:
+                    counters[self.class_path + bucket + field] = value
+                    counters[student_path + bucket + field] = value
+        return counters
+
+
+def rollup_rates(counts):
+    """Returns the rates of a bucket of counters: concentration, tilted,
+    face_closer and understanding, between 0.0 and 1.0
+    """
+    ticks = counts.get('ticks', 0)
+    if not ticks:
+        return {'concentration': 0.0, 'tilted': 0.0, 'face_closer': 0.0, 'understanding': 0.0}
+
+    concentrated = counts.get('concentrated', 0)
+    return {'concentration': concentrated / ticks,
+            'tilted': counts.get('tilted', 0) / ticks,
+            'face_closer': counts.get('face_closer', 0) / ticks,
+            'understanding': counts.get('understood', 0) / concentrated if concentrated else 0.0}
+
+
+def read_rollups(store, path, minutes=5):
+    """Returns [(start minute, rates)] of the buckets of a class or a student.
+
+    Arguments:
+        store (SeriesStore): Store where the counters were incremented
+        path (str): Path of the class or of the student
+        minutes (int): Size of the buckets, one of BUCKET_MINUTES
+    """
+    buckets = store.read_counters(path.strip('/') + '/rollup/%dm' % minutes) or {}
+    return [(int(bucket) * minutes, rollup_rates(counts)) for bucket, counts in sorted(buckets.items())]
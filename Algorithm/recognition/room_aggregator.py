@@ -0,0 +1,69 @@
+GAZE_NAMES = ['center', 'left', 'right', 'blinking']
+
+
+def gaze_mode(histogram):
+    """Returns the most frequent gaze code ('0' to '3') of a histogram.
+    On equality the smallest code wins, like in EyeTrackingMA.
+
+    Argument:
+        histogram (list): Number of students for each gaze code
+    """
+    return str(histogram.index(max(histogram)))
+
+
+class RoomAggregator(object):
+    """
+    This class aggregates the gaze of the students of a class, tick by tick.
+    Each student adds its gaze to the histogram of the tick:
+
+        <class>/gaze_histogram/<tick>/<gaze name>
+
+    Once the tick is closed ('score_delay' seconds after its end, when
+    every student had time to report it) the mode of the histogram is
+    published once in <class>/gaze_mode/<tick>, and every student is scored
+    against that same published mode whatever the order they report in.
+
+    Arguments:
+        class_path (str): Path of the class
+        scheduler (SamplingScheduler): Scheduler giving the tick of a time
+        score_delay (float): Seconds to wait after the end of a tick before scoring it
+    """
+
+    def __init__(self, class_path, scheduler, score_delay):
+        self.class_path = class_path.strip('/')
+        self.scheduler = scheduler
+        self.score_delay = score_delay
+
+    def histogram_path(self, tick):
+        return self.class_path + '/gaze_histogram/%d' % tick
+
+    def counters(self, tick, gaze):
+        """Returns the increment of the histogram of the tick for a gaze code, for SeriesStore.increment"""
+        return {self.histogram_path(tick) + '/' + GAZE_NAMES[int(gaze)]: 1}
+
+    def closed_tick(self, now):
+        """Returns the last tick closed at 'now'"""
+        return self.scheduler.tick_of(now - self.score_delay) - 1
+
+    def publish(self, store, room, tick):
+        """Returns the gaze mode of a closed tick. The first student to
+        call it publishes the mode of the histogram, the others get the
+        published value.
+
+        Arguments:
+            store (SeriesStore): Store of the histogram counters
+            room (firebase_admin.db.Reference): Reference of the class
+            tick (int): Closed tick
+        """
+        histogram = store.read_counters(self.histogram_path(tick)) or {}
+        mode = gaze_mode([histogram.get(name, 0) for name in GAZE_NAMES])
+        return room.child('gaze_mode').child(str(tick)).transaction(
+            lambda published: published if published is not None else mode)
+
+    def score(self, store, room, tick, gaze):
+        """Returns the gaze score of a student for a closed tick: '1' when
+        its gaze is the mode of the class, '0' otherwise
+        """
+        if gaze == self.publish(store, room, tick):
+            return '1'
+        return '0'
@@ -0,0 +1,207 @@
+from __future__ import division
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: 잠금 없이 대략적인 budget
+    fcntl = None
+
+# budget 파일: 남은 CPU 초, 마지막으로 채운 시각
+BUDGET_STATE = struct.Struct('dd')
+DEFAULT_BUDGET_PATH = os.path.join(tempfile.gettempdir(), 'uume-cpu-budget')
+
+
+class CpuBudget(object):
+    """
+    This class is a token bucket of CPU seconds shared by every analysis
+    process of the host. It is refilled with 'cores' CPU seconds per
+    second, and each sample is charged the CPU time it really used, so
+    all the students of the host together stay under the budget.
+
+    The bucket lives in a small memory-mapped file, so the sessions
+    started as separate processes (ex: one per student by the web server)
+    share it without any server.
+    """
+
+    def __init__(self, cores=None, burst=None, path=DEFAULT_BUDGET_PATH):
+        if cores is None:
+            # 한 core 는 웹 서버, 카메라 등을 위해 남겨둠
+            cores = max(1, (os.cpu_count() or 1) - 1)
+        self.cores = cores
+        self.burst = burst if burst is not None else 2.0 * cores
+        self.path = path
+
+        self._file = open(path, 'a+b')
+        if os.path.getsize(path) < BUDGET_STATE.size:
+            self._file.write(BUDGET_STATE.pack(self.burst, time.time()))
+            self._file.flush()
+        self._map = mmap.mmap(self._file.fileno(), BUDGET_STATE.size)
+
+    def _lock(self):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+
+    def _unlock(self):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def _update(self, charge=0.0):
+        """Refills the bucket, charges it and returns the seconds left"""
+        self._lock()
+        try:
+            tokens, last = BUDGET_STATE.unpack(self._map[:BUDGET_STATE.size])
+            now = time.time()
+            tokens = min(self.burst, tokens + max(now - last, 0.0) * self.cores) - charge
+            self._map[:BUDGET_STATE.size] = BUDGET_STATE.pack(tokens, now)
+            return tokens
+        finally:
+            self._unlock()
+
+    def tokens(self):
+        """Returns the CPU seconds left in the bucket, negative when the
+        samples used more than the budget
+        """
+        return self._update()
+
+    def available(self):
+        """Returns True while the host has CPU time left for a sample"""
+        return self.tokens() > 0
+
+    def refill_time(self, tokens):
+        """Returns the seconds until the bucket gets back to 0 from 'tokens'"""
+        return max(-tokens, 0.0) / self.cores
+
+    def charge(self, seconds):
+        """Charges the CPU seconds used by a sample"""
+        self._update(seconds)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class SamplingScheduler(object):
+    """
+    This class decides when the next frame of a student is analyzed.
+    Frames are sampled every 'slow_interval' seconds while the head angle,
+    the face size and the gaze are stable, every 'fast_interval' seconds
+    as soon as one of them changes, and the interval grows back after
+    'calm_samples' stable samples. When the CPU budget of the host is
+    used up the next sample waits for the slow interval, and at least
+    until the bucket is refilled (the CPU seconds owed divided by the cores).
+
+    The results are indexed by tick: tick n covers [origin + n * period,
+    origin + (n + 1) * period), and every student of a room uses the same
+    origin, so their ticks stay comparable whatever their sampling rate.
+    """
+
+    def __init__(self, period=3.0, origin=None, slow_interval=6.0, fast_interval=1.0,
+                 head_delta=5.0, size_delta=0.05, gaze_delta=0.1, calm_samples=3, budget=None):
+        self.period = period
+        self.origin = origin
+        self.slow_interval = slow_interval
+        self.fast_interval = fast_interval
+        self.head_delta = head_delta
+        self.size_delta = size_delta
+        self.gaze_delta = gaze_delta
+        self.calm_samples = calm_samples
+        self.budget = budget
+
+        self.interval = fast_interval
+        self.last_sample = None
+        self._calm = 0
+        self._signals = None
+
+    def tick_of(self, timestamp):
+        """Returns the index of the tick of a time (time.time())"""
+        if self.origin is None:
+            self.origin = timestamp
+        return int((timestamp - self.origin) // self.period)
+
+    def _changed(self, signals, previous):
+        if previous is None:
+            return True
+        head, size, gaze = signals
+        pre_head, pre_size, pre_gaze = previous
+
+        for value, previous in ((head, pre_head), (size, pre_size), (gaze, pre_gaze)):
+            # 얼굴이나 눈동자를 찾았다가 놓치거나 그 반대
+            if (value is None) != (previous is None):
+                return True
+
+        if head is not None and abs(head - pre_head) >= self.head_delta:
+            return True
+        if size is not None and pre_size and abs(size - pre_size) / pre_size >= self.size_delta:
+            return True
+        if gaze is not None and abs(gaze - pre_gaze) >= self.gaze_delta:
+            return True
+        return False
+
+    def observe(self, head=None, size=None, gaze=None):
+        """Adapts the interval to the signals of the last sample and returns
+        True when they changed.
+
+        Arguments:
+            head (float): Angle of the head in degrees, None without face
+            size (float): Distance between the eye corners in pixels, None without face
+            gaze (float): Horizontal ratio of the pupils, None without pupils
+        """
+        signals = (head, size, gaze)
+        changed = self._changed(signals, self._signals)
+        self._signals = signals
+        return self._adapt(changed)
+
+    def observe_tracks(self, signals):
+        """Same as observe() for the faces of a classroom camera: the
+        interval gets short as soon as one face changes, appears or leaves.
+
+        Argument:
+            signals (dict): {track id: (head, size, gaze)} of the faces of the last sample
+        """
+        previous = self._signals if isinstance(self._signals, dict) else {}
+        changed = set(signals) != set(previous) or any(
+            self._changed(values, previous[track]) for track, values in signals.items())
+        self._signals = dict(signals)
+        return self._adapt(changed)
+
+    def _adapt(self, changed):
+        if changed:
+            self.interval = self.fast_interval
+            self._calm = 0
+        else:
+            self._calm += 1
+            if self._calm >= self.calm_samples:
+                self.interval = min(self.interval * 2, self.slow_interval)
+                self._calm = 0
+        return changed
+
+    def charge(self, cpu_seconds):
+        """Charges the CPU time of the last sample to the budget of the host"""
+        if self.budget is not None:
+            self.budget.charge(cpu_seconds)
+
+    def next_sample(self):
+        """Returns the time of the next sample"""
+        if self.last_sample is None:
+            return time.time()
+        interval = self.interval
+        if self.budget is not None:
+            tokens = self.budget.tokens()
+            if tokens <= 0:
+                # budget 을 넘게 쓴 만큼 다시 찰 때까지 기다림
+                return max(self.last_sample + max(interval, self.slow_interval),
+                           time.time() + self.budget.refill_time(tokens))
+        return self.last_sample + interval
+
+    def wait(self):
+        """Sleeps until the next sample and returns its time"""
+        delay = self.next_sample() - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        self.last_sample = time.time()
+        return self.last_sample
@@ -0,0 +1,134 @@
+import base64
+import struct
+import numpy as np
+
+# 한 tick 에 필요한 bit 수 (gaze 는 0~3)
+SERIES_BITS = {'in_seat': 1, 'tilted': 1, 'face_closer': 1, 'gaze': 2, 'gaze_score': 1, 'understand': 1}
+
+# bit 수, flag, tick 수
+HEADER = struct.Struct('!BBI')
+RUN_COUNT = struct.Struct('!I')
+RUN_LENGTH = 1
+
+
+def to_codes(chars):
+    """Returns the chars of a series ('0', '1', ...) as a uint8 array of codes"""
+    return np.frombuffer(chars.encode('ascii'), np.uint8) - ord('0')
+
+
+def to_chars(codes):
+    """Returns a uint8 array of codes as the chars of a series"""
+    return (np.asarray(codes, np.uint8) + ord('0')).tobytes().decode('ascii')
+
+
+def pack(codes, bits):
+    """Packs the codes with 'bits' bits each (1, 2, 4 or 8), the first
+    code in the high bits of the first byte
+    """
+    codes = np.asarray(codes, np.uint8)
+    if bits not in (1, 2, 4, 8):
+        raise ValueError('bits must be 1, 2, 4 or 8')
+    if codes.size and int(codes.max()) >= 1 << bits:
+        raise ValueError('code does not fit in %d bits' % bits)
+
+    # code 마다 bit 를 펼친 뒤 한꺼번에 packbits
+    shifts = np.arange(bits - 1, -1, -1, dtype=np.uint8)
+    bit_matrix = (codes[:, np.newaxis] >> shifts) & 1
+    return np.packbits(bit_matrix.reshape(-1)).tobytes()
+
+
+def unpack(data, bits, length, start=0, stop=None):
+    """Returns the codes [start, stop) of data packed with pack(), only
+    the bytes of the range are unpacked
+    """
+    stop = length if stop is None else min(stop, length)
+    start = min(max(start, 0), stop)
+    per_byte = 8 // bits
+
+    first_byte = start // per_byte
+    last_byte = -(-stop // per_byte)
+    raw = np.frombuffer(data, np.uint8, last_byte - first_byte, first_byte)
+
+    bit_matrix = np.unpackbits(raw).reshape(-1, bits)
+    weights = (1 << np.arange(bits - 1, -1, -1)).astype(np.uint8)
+    codes = (bit_matrix * weights).sum(axis=1).astype(np.uint8)
+
+    offset = first_byte * per_byte
+    return codes[start - offset:stop - offset]
+
+
+def run_lengths(codes):
+    """Returns the (values, lengths) of the runs of equal codes"""
+    codes = np.asarray(codes, np.uint8)
+    if not codes.size:
+        return codes, np.zeros(0, np.uint32)
+    starts = np.flatnonzero(np.diff(codes)) + 1
+    starts = np.concatenate(([0], starts))
+    lengths = np.diff(np.concatenate((starts, [codes.size])))
+    return codes[starts], lengths.astype(np.uint32)
+
+
+def encode(chars, bits, run_length=None):
+    """Encodes the chars of a series.
+
+    Arguments:
+        chars (str): Series, one char per tick
+        bits (int): Bits per tick, ex) SERIES_BITS['gaze']
+        run_length (bool): Encode runs of equal ticks, None to use the smaller encoding
+
+    Returns:
+        The encoded bytes, with a header giving the bits and the number of ticks
+    """
+    codes = to_codes(chars)
+    packed = HEADER.pack(bits, 0, codes.size) + pack(codes, bits)
+    if run_length is False:
+        return packed
+
+    values, lengths = run_lengths(codes)
+    runs = (HEADER.pack(bits, RUN_LENGTH, codes.size) + RUN_COUNT.pack(values.size) +
+            pack(values, bits) + lengths.astype('<u4').tobytes())
+    if run_length or len(runs) < len(packed):
+        return runs
+    return packed
+
+
+def encoded_length(data):
+    """Returns the number of ticks of an encoded series"""
+    return HEADER.unpack_from(data)[2]
+
+
+def decode_codes(data, start=0, stop=None):
+    """Returns the codes [start, stop) of an encoded series as a uint8 array"""
+    bits, flags, length = HEADER.unpack_from(data)
+    stop = length if stop is None else min(stop, length)
+    start = min(max(start, 0), stop)
+
+    if not flags & RUN_LENGTH:
+        return unpack(memoryview(data)[HEADER.size:], bits, length, start, stop)
+
+    count = RUN_COUNT.unpack_from(data, HEADER.size)[0]
+    values_offset = HEADER.size + RUN_COUNT.size
+    lengths_offset = values_offset + -(-count * bits // 8)
+    values = unpack(memoryview(data)[values_offset:lengths_offset], bits, count)
+    lengths = np.frombuffer(data, '<u4', count, lengths_offset)
+
+    # 범위에 걸친 run 만 펼치기
+    ends = np.cumsum(lengths, dtype=np.int64)
+    first = int(np.searchsorted(ends, start, 'right'))
+    last = int(np.searchsorted(ends, stop, 'left')) + 1
+    run_lengths_in_range = np.minimum(ends[first:last], stop) - np.maximum(ends[first:last] - lengths[first:last], start)
+    return np.repeat(values[first:last], np.maximum(run_lengths_in_range, 0))
+
+
+def decode(data, start=0, stop=None):
+    """Returns the chars [start, stop) of an encoded series"""
+    return to_chars(decode_codes(data, start, stop))
+
+
+def to_text(data):
+    """Returns encoded bytes as text, for the databases storing only strings"""
+    return base64.b64encode(data).decode('ascii')
+
+
+def from_text(text):
+    return base64.b64decode(text)
@@ -0,0 +1,302 @@
+import sqlite3
+import threading
+from . import series_codec
+
+SERIES = ['in_seat', 'tilted', 'face_closer', 'gaze', 'gaze_score']
+
+
+class SeriesStore(object):
+    """
+    This class stores the per-tick results of a student ('in_seat',
+    'tilted', ...) in chunked segments keyed by tick range.
+    Each tick is appended on its own instead of rewriting the whole
+    string, and the segments are merged back on read.
+    """
+
+    def __init__(self, chunk_size=100):
+        self.chunk_size = chunk_size
+
+    def chunk_key(self, tick):
+        """Returns the key of the segment holding the tick, ex) '000100_000199'"""
+        start = tick - tick % self.chunk_size
+        return '%06d_%06d' % (start, start + self.chunk_size - 1)
+
+    @staticmethod
+    def tick_key(tick):
+        """Returns the key of the tick inside its segment"""
+        return 't%06d' % tick
+
+    @staticmethod
+    def merge(chunks, start=0, stop=None):
+        """Merges segments {chunk_key: {tick_key: value}} back in one string.
+
+        Arguments:
+            chunks (dict): Segments of a series
+            start (int): First tick to keep
+            stop (int): Tick after the last one to keep, None for the end
+        """
+        values = []
+        for chunk_key in sorted(chunks or {}):
+            for tick_key, value in sorted(chunks[chunk_key].items()):
+                tick = int(tick_key[1:])
+                if tick >= start and (stop is None or tick < stop):
+                    values.append(str(value))
+        return ''.join(values)
+
+    def append(self, path, tick, values):
+        """Appends the values of one tick.
+
+        Arguments:
+            path (str): Path of the student, ex) 'class_v2/<teacher>/<date>/<class>/<student>'
+            tick (int): Index of the tick
+            values (dict): {series name: chars of the tick}
+        """
+        raise NotImplementedError
+
+    def append_many(self, entries):
+        """Appends many ticks at once.
+
+        Argument:
+            entries (list): (path, tick, values) to append
+        """
+        for path, tick, values in entries:
+            self.append(path, tick, values)
+
+    def read(self, path, series, start=0, stop=None):
+        """Returns the chars of a series between two ticks as one string"""
+        raise NotImplementedError
+
+    def length(self, path, series):
+        """Returns the number of ticks stored for a series"""
+        raise NotImplementedError
+
+    def pack(self, path, series_names=None):
+        """Replaces the per-tick segments of the series of a student by their
+        bit-packed (or run-length) encoding, ex) when the student leaves.
+        Ticks appended later are stored per tick again, after the packed ones.
+
+        Arguments:
+            path (str): Path of the student
+            series_names (list): Series to pack, every series of SERIES_BITS by default
+        """
+        raise NotImplementedError
+
+    def increment(self, counters):
+        """Adds to counters shared by many writers, ex) the rollups of a class.
+
+        Argument:
+            counters (dict): {counter path: value to add}
+        """
+        raise NotImplementedError
+
+    def read_counters(self, path):
+        """Returns the counters under a path as nested dicts, None if there is none"""
+        raise NotImplementedError
+
+    @staticmethod
+    def _join(packed, path_read, start, stop):
+        """Reads [start, stop) from the packed ticks first, then from the
+        ticks stored after them with path_read(start, stop)
+        """
+        if packed is None:
+            return path_read(start, stop)
+
+        length = series_codec.encoded_length(packed)
+        chars = ''
+        if start < length:
+            chars = series_codec.decode(packed, start, stop)
+        if stop is None or stop > length:
+            chars += path_read(max(start, length), stop)
+        return chars
+
+
+class FirebaseSeriesStore(SeriesStore):
+    """
+    Series stored in the realtime database under <path>/series/<name>/<chunk_key>/<tick_key>,
+    and under <path>/packed/<name> (base64) once packed. The dashboard
+    (chart.html) decodes the packed series and merges the segments after it.
+    """
+
+    def __init__(self, chunk_size=100):
+        super(FirebaseSeriesStore, self).__init__(chunk_size)
+
+        # firebase_admin 은 이 backend 를 쓸 때만 필요
+        from firebase_admin import db
+        self._db = db
+
+    def _update_of(self, path, tick, values):
+        """Returns the multi-path update of one tick, from the root of the database"""
+        update = {}
+        for series, value in values.items():
+            update[path + '/series/' + series + '/' + self.chunk_key(tick) + '/' + self.tick_key(tick)] = value
+        return update
+
+    def append(self, path, tick, values):
+        self.append_many([(path, tick, values)])
+
+    def append_many(self, entries):
+        # 모든 tick 을 root 기준 multi-path update 한 번으로 저장
+        update = {}
+        for path, tick, values in entries:
+            update.update(self._update_of(path.strip('/'), tick, values))
+        if update:
+            self._db.reference('/').update(update)
+
+    def _packed(self, path, series):
+        text = self._db.reference(path + '/packed/' + series).get()
+        if text is None:
+            return None
+        return series_codec.from_text(text)
+
+    def read(self, path, series, start=0, stop=None):
+        return self._join(self._packed(path, series), lambda start, stop: self._read(path, series, start, stop),
+                          start, stop)
+
+    def _read(self, path, series, start, stop):
+        ref = self._db.reference(path + '/series/' + series)
+
+        if start > 0 or stop is not None:
+            # 필요한 segment 만 가져오기
+            query = ref.order_by_key().start_at(self.chunk_key(start))
+            if stop is not None:
+                query = query.end_at(self.chunk_key(max(stop - 1, 0)))
+            chunks = query.get()
+        else:
+            chunks = ref.get()
+
+        return self.merge(chunks, start, stop)
+
+    def length(self, path, series):
+        packed = self._packed(path, series)
+        length = series_codec.encoded_length(packed) if packed is not None else 0
+
+        chunks = self._db.reference(path + '/series/' + series).order_by_key().limit_to_last(1).get()
+        if not chunks:
+            return length
+        last_chunk = list(chunks.values())[-1]
+        return max(length, int(max(last_chunk)[1:]) + 1)
+
+    def increment(self, counters):
+        # server 에서 더하기 때문에 여러 학생이 같은 counter 를 동시에 올려도 됨
+        update = dict((path.strip('/'), {'.sv': {'increment': value}}) for path, value in counters.items())
+        if update:
+            self._db.reference('/').update(update)
+
+    def read_counters(self, path):
+        return self._db.reference(path).get()
+
+    def pack(self, path, series_names=None):
+        path = path.strip('/')
+        update = {}
+        for series in series_names or series_codec.SERIES_BITS:
+            chars = self.read(path, series)
+            if not chars:
+                continue
+            # 변환한 값 저장과 tick 별 segment 삭제를 update 한 번으로
+            packed = series_codec.encode(chars, series_codec.SERIES_BITS[series])
+            update[path + '/packed/' + series] = series_codec.to_text(packed)
+            update[path + '/series/' + series] = None
+        if update:
+            self._db.reference('/').update(update)
+
+
+class SQLiteSeriesStore(SeriesStore):
+    """
+    Series stored in a local SQLite file, to run without Firebase.
+    """
+
+    def __init__(self, filename=':memory:', chunk_size=100):
+        super(SQLiteSeriesStore, self).__init__(chunk_size)
+
+        # write-behind thread 에서도 쓸 수 있도록 lock 으로 보호
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(filename, check_same_thread=False)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS series ('
+                                 'path TEXT, series TEXT, chunk TEXT, tick INTEGER, value TEXT, '
+                                 'PRIMARY KEY (path, series, tick))')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS packed ('
+                                 'path TEXT, series TEXT, data BLOB, PRIMARY KEY (path, series))')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS counters (path TEXT PRIMARY KEY, value INTEGER)')
+        self._connection.commit()
+
+    def append(self, path, tick, values):
+        self.append_many([(path, tick, values)])
+
+    def append_many(self, entries):
+        rows = [(path, series, self.chunk_key(tick), tick, value)
+                for path, tick, values in entries for series, value in values.items()]
+        with self._lock:
+            self._connection.executemany('INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?)', rows)
+            self._connection.commit()
+
+    def _packed(self, path, series):
+        with self._lock:
+            row = self._connection.execute('SELECT data FROM packed WHERE path = ? AND series = ?',
+                                           (path, series)).fetchone()
+        if row is None:
+            return None
+        return bytes(row[0])
+
+    def read(self, path, series, start=0, stop=None):
+        return self._join(self._packed(path, series), lambda start, stop: self._read(path, series, start, stop),
+                          start, stop)
+
+    def _read(self, path, series, start, stop):
+        if stop is None:
+            stop = self.length(path, series)
+        with self._lock:
+            rows = self._connection.execute('SELECT value FROM series WHERE path = ? AND series = ? '
+                                            'AND tick >= ? AND tick < ? ORDER BY tick',
+                                            (path, series, start, stop)).fetchall()
+        return ''.join(value for value, in rows)
+
+    def length(self, path, series):
+        packed = self._packed(path, series)
+        length = series_codec.encoded_length(packed) if packed is not None else 0
+
+        with self._lock:
+            row = self._connection.execute('SELECT MAX(tick) FROM series WHERE path = ? AND series = ?',
+                                           (path, series)).fetchone()
+        if row[0] is None:
+            return length
+        return max(length, row[0] + 1)
+
+    def pack(self, path, series_names=None):
+        for series in series_names or series_codec.SERIES_BITS:
+            chars = self.read(path, series)
+            if not chars:
+                continue
+            packed = series_codec.encode(chars, series_codec.SERIES_BITS[series])
+            with self._lock:
+                self._connection.execute('INSERT OR REPLACE INTO packed VALUES (?, ?, ?)',
+                                         (path, series, sqlite3.Binary(packed)))
+                self._connection.execute('DELETE FROM series WHERE path = ? AND series = ?', (path, series))
+                self._connection.commit()
+
+    def increment(self, counters):
+        with self._lock:
+            self._connection.executemany('INSERT INTO counters VALUES (?, ?) '
+                                         'ON CONFLICT(path) DO UPDATE SET value = value + excluded.value',
+                                         [(path.strip('/'), value) for path, value in counters.items()])
+            self._connection.commit()
+
+    def read_counters(self, path):
+        prefix = path.strip('/') + '/'
+        with self._lock:
+            rows = self._connection.execute('SELECT path, value FROM counters WHERE substr(path, 1, ?) = ?',
+                                            (len(prefix), prefix)).fetchall()
+        if not rows:
+            return None
+
+        counters = {}
+        for counter_path, value in rows:
+            node = counters
+            keys = counter_path[len(prefix):].split('/')
+            for key in keys[:-1]:
+                node = node.setdefault(key, {})
+            node[keys[-1]] = value
+        return counters
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
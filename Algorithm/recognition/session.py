@@ -0,0 +1,537 @@
+import collections
+import time
+from datetime import datetime
+from .metrics import Metrics
+from .room_aggregator import RoomAggregator
+from .rollup import Rollups
+from .scheduler import SamplingScheduler
+from .series_store import FirebaseSeriesStore
+from .student_state import StudentState
+from .write_behind import WriteBehindStore
+
+DATABASE_URL = 'https://uume-58fe8-default-rtdb.firebaseio.com/'
+CREDENTIAL_PATH = 'Setting File/uume.json'
+PREDICTOR_PATH = 'Setting File/shape_predictor_68_face_landmarks.dat'
+CALIBRATION_DIRECTORY = 'Setting File/calibration'
+
+ALL = list(range(0, 68))
+RIGHT_EYEBROW = list(range(17, 22))
+LEFT_EYEBROW = list(range(22, 27))
+RIGHT_EYE = list(range(36, 42))
+LEFT_EYE = list(range(42, 48))
+NOSE = list(range(27, 36))
+MOUTH_OUTLINE = list(range(48, 61))
+MOUTH_INNER = list(range(61, 68))
+JAWLINE = list(range(0, 17))
+
+UsingLandmark = list(range(27, 28)) + list(range(30, 31))
+
+# 학생이 들어오기 전 tick 의 값 (얼굴이 없을 때와 같음)
+ABSENT = {'in_seat': '0', 'tilted': '0', 'face_closer': '0', 'gaze': '3'}
+
+# 화면을 띄웠을 때 key 로 그릴 landmark 바꾸기
+LANDMARK_KEYS = {
+    ord('1'): ALL,
+    ord('2'): LEFT_EYEBROW + RIGHT_EYEBROW,
+    ord('3'): LEFT_EYE + RIGHT_EYE,
+    ord('4'): NOSE,
+    ord('5'): MOUTH_OUTLINE + MOUTH_INNER,
+    ord('6'): JAWLINE,
+}
+
+
+def initialize_firebase(credential_path=CREDENTIAL_PATH, database_url=DATABASE_URL):
+    """Initializes firebase_admin once per process, on first use"""
+    import firebase_admin
+    from firebase_admin import credentials
+
+    try:
+        return firebase_admin.get_app()
+    except ValueError:
+        return firebase_admin.initialize_app(credentials.Certificate(credential_path), {
+            'databaseURL': database_url
+        })
+
+
+def class_paths(room_name, user_id, today=None):
+    """Returns the database paths of the student and of the class.
+
+    Arguments:
+        room_name (str): 'teacherID-class name', ex) seojin915-scienceA (A 는 시간)
+        user_id (str): Student id
+        today (datetime): Date of the class, today by default
+    """
+    teacher_id, class_name = room_name.split('-', 1)
+    today = today or datetime.today()
+    date = str(today.year) + str(today.month) + str(today.day)
+
+    class_path = 'class_v2/' + teacher_id + '/' + date + '/' + class_name
+    return class_path + '/' + user_id, class_path
+
+
+class StudentSeries(object):
+    """
+    This class writes the ticks of one student of a session (or one face
+    of a classroom camera) in its series: the pending tick, the ticks
+    skipped by the scheduler, the gaze score and the rollups.
+
+    The gaze of each tick is added to the gaze histogram of the class, and
+    scored once the tick is closed (see RoomAggregator).
+    """
+
+    def __init__(self, session, student):
+        self.session = session
+        self.student = student
+        self.path = session.class_path + '/' + student
+        # 반, 학생의 1/5/15분 요약
+        self.rollups = Rollups(session.class_path, student, session.scheduler.period)
+        # 아직 저장하지 않은 tick 과 그 tick 의 마지막 결과
+        self.tick = 0
+        # series 의 첫 글자가 되는 tick
+        self.start_tick = 0
+        self._pending = None
+        # gaze 점수를 아직 계산하지 않은 (tick, gaze)
+        self._unscored = collections.deque()
+
+    def open(self, tick, backfill=True):
+        """Registers the student in the class and fills the ticks before
+        'tick' since the last stored one. Without backfill a new series
+        starts at 'tick', saved as the 'start_tick' of the student, and
+        nothing waits for the database (a face appearing in the frame loop).
+        """
+        session = self.session
+        session.store.increment(self.rollups.joined())
+
+        if not backfill:
+            # 처음 보인 tick 부터 새 series, 등록은 background 에서
+            self.start_tick = self.tick = tick
+            self._run(self._register, tick)
+            return
+
+        self._register()
+        # 이전에 저장된 tick 다음부터, 그 사이 자리에 없던 tick 은 ABSENT 로 채움
+        self.tick = session.store.length(self.path, 'in_seat')
+        self.advance(tick, None)
+
+    def _register(self, start_tick=None):
+        # 반의 학생 목록에 추가 (여러 학생이 동시에 들어와도 빠지지 않게 transaction)
+        room = self.session._room
+        room.child('students').transaction(lambda students: str(students or '') + self.student + '.')
+        if start_tick is not None:
+            room.child(self.student).update({'start_tick': start_tick})
+
+    def _run(self, function, *args):
+        # write-behind store 면 background thread 에서 실행 (분석 loop 는 기다리지 않음)
+        store = self.session.store
+        if hasattr(store, 'defer'):
+            store.defer(function, *args)
+        else:
+            function(*args)
+
+    def _score_gaze(self, tick, gaze_value):
+        session = self.session
+        # 닫힌 tick 의 histogram 으로 최빈값 계산
+        # 처음 계산한 학생의 최빈값만 저장되고, 모든 학생이 저장된 같은 값과 비교
+        with session.metrics.timer('db_gaze_histogram', session.room_name, self.student):
+            gaze_score = session.aggregator.score(session.store, session._room, tick, gaze_value)
+        session.store.append(self.path, tick - self.start_tick, {'gaze_score': gaze_score})
+
+    def write(self, tick, result, score=True):
+        store = self.session.store
+        # 이번 tick 결과만 파이어베이스에 추가, gaze 점수는 background 에서 계산 후 추가
+        with self.session.metrics.timer('db_write', self.session.room_name, self.student):
+            store.append(self.path, tick - self.start_tick, result)
+            store.increment(self.rollups.counters(tick, result))
+            if not score or result is ABSENT:
+                # 자리에 없던 tick 은 gaze 최빈값 계산에서 제외
+                store.append(self.path, tick - self.start_tick, {'gaze_score': '0'})
+            else:
+                # 반의 tick 별 gaze histogram 에 내 결과 더하기 (server 에서 더함)
+                store.increment(self.session.aggregator.counters(tick, result['gaze']))
+                self._unscored.append((tick, result['gaze']))
+
+    def score_closed(self, now=None, closed_tick=None):
+        """Scores the gaze of the ticks closed at 'now' (time.time() by default),
+        or of every tick up to 'closed_tick'
+        """
+        if closed_tick is None:
+            if now is None:
+                now = time.time()
+            closed_tick = self.session.aggregator.closed_tick(now)
+        while self._unscored and self._unscored[0][0] <= closed_tick:
+            self._run(self._score_gaze, *self._unscored.popleft())
+
+    @property
+    def scored(self):
+        """True when the gaze of every written tick is scored (or being scored)"""
+        return not self._unscored
+
+    def advance(self, tick, result):
+        """Writes the ticks before 'tick': the pending one and the skipped
+        ones with the same result (the student didn't change), or ABSENT
+        when nothing was analyzed yet. 'result' becomes the pending tick.
+        """
+        if tick > self.tick:
+            if self._pending is not None:
+                self.write(self.tick, self._pending)
+                for skipped in range(self.tick + 1, tick):
+                    self.write(skipped, self._pending)
+                    self.session.metrics.increment('ticks_carried', self.session.room_name, self.student)
+            else:
+                for skipped in range(self.tick, tick):
+                    self.write(skipped, ABSENT, score=False)
+            self.tick = tick
+
+        if result is not None:
+            # 한 tick 에 여러 번 분석하면 마지막 결과를 저장
+            self._pending = result
+        self.score_closed()
+
+    def close(self):
+        """Writes the pending tick"""
+        if self._pending is not None:
+            self.write(self.tick, self._pending)
+            self.tick += 1
+            self._pending = None
+
+
+class FaceTrack(object):
+    """State, gaze tracking and series of one face of a classroom camera"""
+
+    def __init__(self, state, gaze, series):
+        self.state = state
+        self.gaze = gaze
+        self.series = series
+
+
+class RecognitionSession(object):
+    """
+    This class runs the recognition of one student: it reads the frames
+    of a source, analyzes them and appends the result of each tick to the
+    series of the student in the database.
+
+    With multi_face=True one camera covers several students: every face
+    is tracked with a stable track id and gets its own state, gaze
+    tracking and series, stored as the student '<user_id>-<n>' from the
+    tick it first appears (n counts the faces of the camera, after the ones
+    already stored in the class). A face lost by the tracker is ABSENT
+    until it comes back, and its series is closed once the tracker
+    retires its track.
+
+    Nothing heavy is done when it is created: firebase_admin, the dlib
+    models and the cv2 window are only loaded when the session is opened
+    (or when the window is shown), so the module imports fast in workers,
+    tests and the processes spawned by the web server.
+    """
+
+    def __init__(self, room_name, user_id, camera_id='0', scheduler=None, TH_threshold=25, FC_threshold=20,
+                 detection_scale=1.0, predictor_path=PREDICTOR_PATH, credential_path=CREDENTIAL_PATH,
+                 database_url=DATABASE_URL, calibration_directory=CALIBRATION_DIRECTORY, metrics_path=None,
+                 display=False, store=None, pupil_method='contours', multi_face=False, score_delay=None,
+                 metrics_interval=10, redetect_seconds=5.0):
+        self.room_name = room_name
+        self.user_id = user_id
+        self.camera_id = camera_id
+        # 언제 frame 을 분석할지, 몇 번째 tick 인지 결정
+        self.scheduler = scheduler or SamplingScheduler()
+        self.TH_threshold = TH_threshold
+        self.FC_threshold = FC_threshold
+        self.predictor_path = predictor_path
+        self.credential_path = credential_path
+        self.database_url = database_url
+        self.calibration_directory = calibration_directory
+        self.metrics_path = metrics_path
+        # metrics 파일은 metrics_interval 번 분석할 때마다 한 번 씀
+        self.metrics_interval = metrics_interval
+        self.display = display
+        self.pupil_method = pupil_method
+        self.multi_face = multi_face
+        # tick 이 끝나고 gaze 최빈값을 계산할 때까지 기다리는 시간 (느리게 분석하는 학생도 저장할 수 있게)
+        if score_delay is None:
+            score_delay = 2 * self.scheduler.slow_interval
+
+        self.path, self.class_path = class_paths(room_name, user_id)
+        # 반의 tick 별 gaze histogram 과 최빈값
+        self.aggregator = RoomAggregator(self.class_path, self.scheduler, score_delay)
+
+        # 학생 한 명의 moving window, calibration, gaze window
+        # (multi_face 에서는 얼굴 추적만 사용)
+        # redetect_seconds=0 이면 매 sample 얼굴 검출 (OfflineReplay 와 같은 결과)
+        self.state = StudentState(TH_threshold, FC_threshold, redetect_seconds=redetect_seconds,
+                                  detection_scale=detection_scale)
+        self.tracker = self.state.tracker
+        self.metrics = Metrics()
+        self.landmarks_drawn = UsingLandmark
+
+        self.store = store
+        self.series = StudentSeries(self, user_id)
+        # multi_face 에서 track id 별 얼굴
+        self.tracks = {}
+        # tracker 가 더 이상 찾지 않는 얼굴 중 gaze 점수를 아직 다 계산하지 않은 얼굴
+        self.retired = []
+        # 점수 계산이 끝난 retired 얼굴의 series path (close 때 pack)
+        self._finished = []
+        self.gaze = None
+        self.profiles = None
+        self._room = None
+        self._detector = None
+        self._predictor = None
+        self._opened = False
+        self._analyzed = 0
+        # multi_face 에서 첫 얼굴의 번호
+        self._first_track = 0
+
+    @property
+    def tick(self):
+        """Tick which is being analyzed"""
+        if self.multi_face:
+            return max([track.series.tick for track in self.tracks.values()] + [0])
+        return self.series.tick
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def open(self):
+        """Loads the models, connects to the database and registers the
+        student in the class. Called by run() if needed.
+        """
+        if self._opened:
+            return
+        # dlib 모델과 firebase 는 여기서 처음 load
+        from gaze_tracking import CalibrationProfiles, get_face_detector, get_predictor
+        from firebase_admin import db
+
+        self._detector = get_face_detector()
+        self._predictor = get_predictor(self.predictor_path)
+        self.gaze = self._gaze_tracking()
+
+        initialize_firebase(self.credential_path, self.database_url)
+        self._room = db.reference(self.class_path)
+
+        if self.store is None:
+            # 파이어베이스 저장은 background thread 에서 1초마다 모아서 처리 (분석 loop 는 기다리지 않음)
+            self.store = WriteBehindStore(FirebaseSeriesStore(), interval=1.0,
+                                          metrics=self.metrics, room=self.room_name)
+        elif getattr(self.store, 'metrics', False) is None:
+            # 밖에서 만든 write-behind store 도 이 session 의 metrics 에 기록
+            self.store.metrics = self.metrics
+            self.store.room = self.room_name
+
+        # 같은 학생, 같은 카메라로 이미 calibration 을 했으면 저장된 값 사용
+        if self.calibration_directory is not None and not self.multi_face:
+            self.profiles = CalibrationProfiles(self.calibration_directory)
+            self.state.calibration = self.profiles.get(self.user_id, self.camera_id) or self.state.calibration
+        self.gaze.calibration = self.state.calibration
+
+        # 반의 모든 학생이 같은 시각을 tick 0 으로 사용 (처음 들어온 학생이 정함)
+        if self.scheduler.origin is None:
+            now = time.time()
+            self.scheduler.origin = self._room.child('started_at').transaction(
+                lambda started_at: started_at if started_at is not None else now)
+
+        self._opened = True
+        if not self.multi_face:
+            self.series.open(self.scheduler.tick_of(time.time()))
+        else:
+            # 같은 카메라로 다시 열면 이전에 저장된 얼굴 다음 번호부터 (series 가 겹치지 않게)
+            prefix = self.user_id + '-'
+            numbers = [int(student[len(prefix):]) for student in str(self._room.child('students').get() or '').split('.')
+                       if student.startswith(prefix) and student[len(prefix):].isdigit()]
+            self._first_track = max(numbers) + 1 if numbers else 0
+
+    def _gaze_tracking(self):
+        from gaze_tracking import GazeTracking
+        return GazeTracking(face_detector=self._detector, predictor=self._predictor,
+                            pupil_method=self.pupil_method)
+
+    def _track(self, track_id, tick):
+        """Returns the FaceTrack of a track id, created on its first frame"""
+        track = self.tracks.get(track_id)
+        if track is None:
+            state = StudentState(self.TH_threshold, self.FC_threshold)
+            gaze = self._gaze_tracking()
+            gaze.calibration = state.calibration
+            series = StudentSeries(self, '%s-%d' % (self.user_id, self._first_track + track_id))
+            series.open(tick, backfill=False)
+            track = FaceTrack(state, gaze, series)
+            self.tracks[track_id] = track
+        return track
+
+    def process(self, frame, timestamp=None):
+        """Analyzes one frame taken at 'timestamp' (time.time() by default).
+        Its result is stored as the tick of that time once the tick is over.
+        Returns the result {'in_seat', 'tilted', 'face_closer', 'gaze'},
+        or {track id: result} with multi_face.
+        """
+        self.open()
+        if timestamp is None:
+            timestamp = time.time()
+        if self.multi_face:
+            return self._process_faces(frame, timestamp)
+
+        state = self.state
+        gaze = self.gaze
+
+        # 한 프레임당 gray 변환, 얼굴 검출, landmark 예측은 한 번만 수행
+        # 얼굴 검출은 몇 프레임마다 한 번, 그 사이에는 이전 landmark 로 얼굴 위치 추적
+        analysis = self.tracker.analyze(frame, self._detector, self._predictor, timestamp)
+
+        calibrated = gaze.calibration.is_complete()
+        gaze.refresh(frame, analysis)
+        if self.profiles is not None and not calibrated and gaze.calibration.is_complete():
+            self.profiles.save(self.user_id, self.camera_id, gaze.calibration)
+
+        tick = self.scheduler.tick_of(timestamp)
+        result = state.update(analysis, gaze, tick)
+        self.metrics.observe_tick(self.room_name, self.user_id, analysis, gaze, state)
+
+        if self.display:
+            self._show(analysis, {None: gaze})
+
+        self.series.advance(tick, result)
+
+        # 다음 분석 시각을 정하는 값
+        self.scheduler.observe(state.headAngle, state.faceLength, gaze.sample.horizontal_ratio)
+
+        self._sampled()
+        return result
+
+    def _process_faces(self, frame, timestamp):
+        # 모든 얼굴의 gray 변환, 검출, landmark 는 한 번에 하고 얼굴마다 눈, 고개, 거리 검사
+        analysis = self.tracker.analyze(frame, self._detector, self._predictor, timestamp)
+        self.metrics.observe_tick(self.room_name, self.user_id, analysis)
+        tick = self.scheduler.tick_of(timestamp)
+
+        results = {}
+        signals = {}
+        for face_index, track_id in enumerate(analysis.track_ids):
+            track = self._track(track_id, tick)
+            track.gaze.refresh(frame, analysis, face_index)
+            results[track_id] = track.state.update(analysis, track.gaze, tick, face_index)
+            signals[track_id] = (track.state.headAngle, track.state.faceLength,
+                                 track.gaze.sample.horizontal_ratio)
+
+        # 이번 frame 에 없는 얼굴은 자리에 없음, tracker 가 포기한 얼굴은 series 를 닫음
+        lost = set(self.tracker.lost_track_ids)
+        for track_id, track in list(self.tracks.items()):
+            if track_id not in results and track_id not in lost:
+                track.series.close()
+                self.retired.append(self.tracks.pop(track_id))
+                continue
+            if track_id not in results:
+                results[track_id] = ABSENT
+            track.series.advance(tick, results[track_id])
+        for track in list(self.retired):
+            track.series.score_closed()
+            if track.series.scored:
+                self.retired.remove(track)
+                self._finished.append(track.series.path)
+
+        if self.display:
+            self._show(analysis, dict((track_id, self.tracks[track_id].gaze) for track_id in analysis.track_ids))
+
+        self.scheduler.observe_tracks(signals)
+        self._sampled()
+        return results
+
+    def _sampled(self):
+        # 분석할 때마다 파일을 쓰지 않고 metrics_interval 번마다 한 번
+        self._analyzed += 1
+        if self._analyzed % self.metrics_interval == 0:
+            self._write_metrics()
+
+    def _write_metrics(self):
+        if self.metrics_path is not None:
+            self.metrics.write_prometheus(self.metrics_path + '.prom')
+            self.metrics.write_json(self.metrics_path + '.json')
+
+    def _show(self, analysis, gazes):
+        """Shows the annotated frame, returns False when ESC is pressed
+
+        Arguments:
+            analysis (FrameAnalysis): Faces and landmarks of the frame
+            gazes (dict): {track id: GazeTracking} of the faces, {None: gaze} for one student
+        """
+        # cv2 의 화면 기능은 화면을 띄울 때만 사용
+        import cv2 as cv
+
+        img_frame = analysis.frame.copy()
+        for gaze in gazes.values():
+            sample = gaze.sample
+            if sample.pupils_located:
+                for x, y in (sample.pupil_left, sample.pupil_right):
+                    cv.line(img_frame, (x - 5, y), (x + 5, y), (0, 255, 0))
+                    cv.line(img_frame, (x, y - 5), (x, y + 5), (0, 255, 0))
+
+        for face_index, face in enumerate(analysis.faces):
+            list_points = analysis.landmark_points(face_index)
+            for pt in list_points[self.landmarks_drawn]:
+                cv.circle(img_frame, (int(pt[0]), int(pt[1])), 2, (0, 255, 0), -1)
+            cv.rectangle(img_frame, (face.left(), face.top()), (face.right(), face.bottom()), (0, 0, 255), 3)
+            if self.multi_face:
+                cv.putText(img_frame, str(analysis.track_ids[face_index]), (face.left(), face.top() - 8),
+                           cv.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+
+        cv.imshow('result', img_frame)
+        key = cv.waitKey(1)
+        if key == 27:
+            self.display = False
+            cv.destroyWindow('result')
+            return False
+        self.landmarks_drawn = LANDMARK_KEYS.get(key, self.landmarks_drawn)
+        return True
+
+    def run(self, source):
+        """Processes the frames of a source when the scheduler asks for
+        a sample, until the source ends.
+
+        Argument:
+            source (FrameSource): Source of the frames, ex) BufferedSource(DeviceSource(0), size=1, drop=True)
+        """
+        self.open()
+        frames = iter(source)
+        try:
+            while True:
+                timestamp = self.scheduler.wait()
+                frame = next(frames, None)
+                if frame is None:
+                    # frame source 가 끝남
+                    break
+
+                cpu = time.process_time()
+                self.process(frame, timestamp)
+                self.scheduler.charge(time.process_time() - cpu)
+        finally:
+            source.close()
+
+    def close(self):
+        """Writes the last tick and the data left in the store, and packs
+        the series of the students (1 or 2 bits per tick)
+        """
+        if self.multi_face:
+            series = [track.series for track in list(self.tracks.values()) + self.retired]
+        else:
+            series = [self.series]
+        for student_series in series:
+            student_series.close()
+        if self._opened and self.store is not None:
+            # 마지막 tick 이 닫힐 때까지 (다른 학생도 저장할 때까지) 기다린 뒤 남은 gaze 점수 계산
+            last_tick = max([student_series.tick for student_series in series] + [0])
+            scheduler = self.scheduler
+            if scheduler.origin is not None:
+                delay = scheduler.origin + last_tick * scheduler.period + self.aggregator.score_delay - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            if hasattr(self.store, 'flush'):
+                self.store.flush()
+            for student_series in series:
+                student_series.score_closed(closed_tick=float('inf'))
+            for path in [student_series.path for student_series in series] + self._finished:
+                self.store.pack(path)
+        if self.store is not None and hasattr(self.store, 'close'):
+            self.store.close()
+        self._write_metrics()
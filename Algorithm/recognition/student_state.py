@@ -0,0 +1,168 @@
+from __future__ import division
+import math
+import time
+import numpy as np
+from gaze_tracking.calibration import Calibration
+from gaze_tracking.face_tracker import FaceTracker
+from .gaze_window import GazeWindow, gaze_code
+from .moving_stats import MovingStats
+
+
+def calculateLength(LEyeEdgeX, LEyeEdgeY, REyeEdgeX, REyeEdgeY):
+    eyeEdgeLength = round(math.pow(math.pow((LEyeEdgeX - REyeEdgeX), 2) + math.pow((LEyeEdgeY - REyeEdgeY), 2), 1 / 2))
+    return eyeEdgeLength
+
+
+class StudentState(object):
+    """
+    This class keeps the state of one student between the ticks:
+    the moving windows of the head and face closer checks,
+    the gaze calibration, the gaze window and the face tracking.
+    """
+
+    def __init__(self, TH_threshold=25, FC_threshold=20, window=10, redetect_seconds=5.0, detection_scale=1.0,
+                 gaze_window=1, gaze_hop=None):
+        self.TH_threshold = TH_threshold
+        self.FC_threshold = FC_threshold
+
+        self.TH_moving = MovingStats(window)
+        self.FC_moving = MovingStats(window)
+        self.TH_preMovingAverage = 0
+        self.FC_preMovingAverage = 0
+        # 마지막 tick 의 고개 각도, 눈 끝 사이 거리 (얼굴이 없으면 None)
+        self.headAngle = None
+        self.faceLength = None
+
+        self.calibration = Calibration()
+        self.tracker = FaceTracker(redetect_seconds, detection_scale=detection_scale)
+
+        # tick 별로 gaze 를 세서 window 마다 가장 많은 gaze 를 결과로 사용
+        self.gazeWindow = GazeWindow(gaze_window, gaze_hop)
+        self.tick = -1
+
+        # 마지막 update 의 단계별 시간 (초)
+        self.timings = {}
+
+    def headCheck(self, X1, Y1, X2, Y2):
+        """Returns '1' if the head is tilted, '0' otherwise
+
+        Arguments:
+            X1, Y1: Top of the nose bridge (landmark 27)
+            X2, Y2: Tip of the nose (landmark 30)
+        """
+        theta = np.arctan((X2 - X1) / (Y2 - Y1))
+        angle = theta * 180 / math.pi
+        angle = abs(angle)
+        self.headAngle = angle
+
+        result = '0'
+
+        newMovingAverage = self.TH_moving.update(angle)
+
+        if self.TH_moving.count == 0:
+            self.TH_preMovingAverage = newMovingAverage
+
+        if angle >= self.TH_threshold:
+            # 계산한 각도가 threshold 보다 클 때
+            print("Tilted Head")
+            result = '1'
+
+        if newMovingAverage >= self.TH_threshold:
+            # average 가  threshold 보다 클 때
+            if self.TH_preMovingAverage - (self.TH_threshold / 10) <= newMovingAverage:
+                # 급격하게 고개 각도가 줄어들 때 (고개갸웃 -> 원래대로 돌아올때)를 확인
+                print("Tilted Head")
+                result = '1'
+
+        if self.TH_moving.full:
+            if self.TH_preMovingAverage + (self.TH_threshold / 10) <= newMovingAverage:
+                # 급격하게 고개 각도가 커질 때 (기존 -> 고개 갸웃거릴 때)를 확인
+                print("Tilted Head")
+                result = '1'
+
+        self.TH_preMovingAverage = newMovingAverage
+
+        return result
+
+    def faceCloserCheck(self, list_points):
+        """Returns '1' if the face got closer to the screen, '0' otherwise
+
+        Argument:
+            list_points (numpy.ndarray): 68 landmarks of the face
+        """
+        LEyeEdgeX = list_points[36][0]
+        LEyeEdgeY = list_points[36][1]
+        REyeEdgeX = list_points[45][0]
+        REyeEdgeY = list_points[45][1]
+
+        result = '0'
+
+        faceLength = calculateLength(LEyeEdgeX, LEyeEdgeY, REyeEdgeX, REyeEdgeY)
+        self.faceLength = faceLength
+
+        newMovingAverage = self.FC_moving.update(faceLength)
+
+        if self.FC_preMovingAverage == 0:
+            self.FC_preMovingAverage = newMovingAverage
+        elif self.FC_preMovingAverage + self.FC_threshold <= newMovingAverage:
+            print("Face Closer")
+            result = '1'
+
+        return result
+
+    def gazeCheck(self, gaze, tick):
+        """Counts the gaze of the sample in its window and returns the
+        winner of the window so far (0: center, 1: left, 2: right, 3: blinking).
+        The last sample of a window gives the winner of the whole window.
+
+        Arguments:
+            gaze (GazeTracking): Gaze tracking refreshed with the current frame
+            tick (int): Tick of the sample
+        """
+        self.gazeWindow.add(tick, gaze_code(gaze.sample))
+        return self.gazeWindow.current().winner
+
+    def update(self, analysis, gaze, tick=None, face_index=0):
+        """Runs every check for one sample and returns the chars to append
+        to the series of the student, one char per series. Many samples can
+        be taken in one tick, the gaze char is then the winner of the
+        samples of its window.
+
+        Arguments:
+            analysis (FrameAnalysis): Faces and landmarks of the frame
+            gaze (GazeTracking): Gaze tracking refreshed with the same frame and face
+            tick (int): Tick of the sample, the tick after the last one by default
+            face_index (int): Face of the student in the analysis, None when
+                the student is not in the frame
+
+        Returns:
+            A dict with the 'in_seat', 'tilted', 'face_closer' and 'gaze' chars
+        """
+        if tick is None:
+            tick = self.tick + 1
+        self.tick = tick
+
+        start = time.perf_counter()
+        result = {'in_seat': '', 'tilted': '', 'face_closer': '', 'gaze': str(self.gazeCheck(gaze, tick))}
+        self.timings['window'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.headAngle = None
+        self.faceLength = None
+        # 얼굴 하나만 검사해서 tick 마다 한 글자씩 저장
+        in_seat = face_index is not None and face_index < len(analysis.faces)
+        if in_seat:
+            list_points = analysis.landmark_points(face_index)
+            result['tilted'] = self.headCheck(list_points[27][0], list_points[27][1],
+                                              list_points[30][0], list_points[30][1])
+            result['face_closer'] = self.faceCloserCheck(list_points)
+        self.timings['checks'] = time.perf_counter() - start
+
+        if in_seat:
+            result['in_seat'] = '1'
+        else:
+            result['in_seat'] = '0'
+            result['tilted'] = '0'
+            result['face_closer'] = '0'
+
+        return result
@@ -0,0 +1,48 @@
+import numpy as np
+
+
+def gaze_matrix(gaze_strings):
+    """Returns the gaze codes of the students as a (students, ticks) matrix.
+    Ticks missing at the end of a shorter string, and chars that are
+    not a gaze code, are -1.
+
+    Argument:
+        gaze_strings (list): Gaze string of each student
+    """
+    ticks = max([len(gaze) for gaze in gaze_strings] + [0])
+    matrix = np.full((len(gaze_strings), ticks), -1, np.int8)
+
+    for row, gaze in enumerate(gaze_strings):
+        codes = np.frombuffer(gaze.encode('ascii', 'replace'), np.uint8).astype(np.int8) - ord('0')
+        codes[(codes < 0) | (codes > 3)] = -1
+        matrix[row, :len(codes)] = codes
+
+    return matrix
+
+
+def gaze_modes(matrix):
+    """Returns the most frequent gaze code of each tick (column).
+    On equality the smallest code wins, like totalGazeResult.index(max(...))
+
+    Argument:
+        matrix (numpy.ndarray): (students, ticks) matrix of gaze_matrix
+    """
+    counts = np.stack([(matrix == code).sum(axis=0) for code in range(4)])
+    return counts.argmax(axis=0).astype(np.int8)
+
+
+def understand_strings(gaze_strings):
+    """Computes the 'understand' string of every student at once: '1' when
+    the gaze of the student is the mode of the class at that tick.
+
+    Argument:
+        gaze_strings (list): Gaze string of each student
+
+    Returns:
+        The list of the 'understand' strings, in the same order
+    """
+    matrix = gaze_matrix(gaze_strings)
+    understand = (matrix == gaze_modes(matrix)[np.newaxis, :])
+    chars = np.where(understand, ord('1'), ord('0')).astype(np.uint8)
+
+    return [chars[row, :len(gaze)].tobytes().decode('ascii') for row, gaze in enumerate(gaze_strings)]
@@ -0,0 +1,158 @@
+import collections
+import contextlib
+import threading
+import traceback
+from .series_store import SeriesStore
+
+
+class WriteBehindStore(SeriesStore):
+    """
+    This class queues the appended ticks and writes them to another store
+    from a background thread, so the frame loop never waits for the network.
+    Values of the same tick are coalesced, and every flush sends all the
+    pending ticks in one append_many (one multi-path update for Firebase).
+    Functions given to defer() also run in the background thread, before the flush,
+    and the increments of a counter are summed until the flush. A function
+    which fails is run again on the next flush, like the failed writes.
+    With a Metrics, the writes to the store are timed ('db_flush_increment',
+    'db_flush_append') and the failures counted ('db_flush_errors').
+
+    Arguments:
+        store (SeriesStore): Store written from the background thread
+        interval (float): Seconds between two flushes
+        metrics (Metrics): Metrics of the writes, optional
+        room (str): Room of the metrics
+    """
+
+    def __init__(self, store, interval=1.0, metrics=None, room=''):
+        super(WriteBehindStore, self).__init__(store.chunk_size)
+        self.store = store
+        self.interval = interval
+        self.metrics = metrics
+        self.room = room
+        self.errors = 0
+
+        self._lock = threading.Lock()
+        # deferred function 이 read() 등을 부르면 flush 안에서 다시 flush (같은 thread)
+        self._flush_lock = threading.RLock()
+        self._flushing = False
+        self._pending = collections.OrderedDict()
+        self._counters = {}
+        self._jobs = collections.deque()
+        self._wake = threading.Event()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def append(self, path, tick, values):
+        with self._lock:
+            self._pending.setdefault((path, tick), {}).update(values)
+
+    def increment(self, counters):
+        with self._lock:
+            for path, value in counters.items():
+                self._counters[path] = self._counters.get(path, 0) + value
+
+    def defer(self, function, *args):
+        """Runs function(*args) in the background thread before the next flush"""
+        with self._lock:
+            self._jobs.append((function, args))
+        self._wake.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Runs the deferred functions and writes every pending tick now"""
+        with self._flush_lock:
+            if self._flushing:
+                # deferred function 안에서 부른 flush: 이미 보낸 값만 읽음
+                return
+            self._flushing = True
+            try:
+                self._flush()
+            finally:
+                self._flushing = False
+
+    def _flush(self):
+        while True:
+            with self._lock:
+                if not self._jobs:
+                    break
+                function, args = self._jobs.popleft()
+            try:
+                function(*args)
+            except Exception:
+                # 실패한 function 은 다음 flush 때 같은 순서로 다시 실행 (gaze_score 가 빠지지 않게)
+                self._failed()
+                with self._lock:
+                    self._jobs.appendleft((function, args))
+                break
+
+        with self._lock:
+            pending = self._pending
+            self._pending = collections.OrderedDict()
+            counters = self._counters
+            self._counters = {}
+
+        if counters:
+            try:
+                with self._timer('db_flush_increment'):
+                    self.store.increment(counters)
+            except Exception:
+                # 실패하면 다음 flush 때 새로 들어온 값과 합쳐서 다시 시도
+                self._failed()
+                self.increment(counters)
+
+        if not pending:
+            return
+
+        try:
+            with self._timer('db_flush_append'):
+                self.store.append_many([(path, tick, values) for (path, tick), values in pending.items()])
+        except Exception:
+            # 실패하면 다음 flush 때 다시 시도, 그 사이 새로 들어온 값이 우선
+            self._failed()
+            with self._lock:
+                for key, values in pending.items():
+                    values.update(self._pending.get(key, {}))
+                    self._pending[key] = values
+
+    def _timer(self, stage):
+        if self.metrics is None:
+            return contextlib.nullcontext()
+        return self.metrics.timer(stage, self.room)
+
+    def _failed(self):
+        self.errors += 1
+        if self.metrics is not None:
+            self.metrics.increment('db_flush_errors', self.room)
+        traceback.print_exc()
+
+    def read(self, path, series, start=0, stop=None):
+        self.flush()
+        return self.store.read(path, series, start, stop)
+
+    def length(self, path, series):
+        self.flush()
+        return self.store.length(path, series)
+
+    def read_counters(self, path):
+        self.flush()
+        return self.store.read_counters(path)
+
+    def pack(self, path, series_names=None):
+        self.flush()
+        self.store.pack(path, series_names)
+
+    def close(self):
+        """Stops the background thread after writing everything pending"""
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
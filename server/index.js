@@ -57,7 +57,7 @@ io.on('connection', (socket) => {
     socketList[socket.id] = { userName, video: true, audio: true };
 
     // 여기서 roomId, userName 파이썬으로 보내기
-    // const r=spawn('python', ['1.2 + 2.2.1 + 2.2.2 + 3.1 -Web version.py']);
+    // const r=spawn('python', ['RecognitionAlgorithm.py', roomId, userName], { cwd: '../Algorithm' });
     // r.stdout.on('data', function(data){
     //   console.log(data.toString());
     // });